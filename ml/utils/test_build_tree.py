@@ -4,17 +4,23 @@ Test script for RAPTOR build_tree endpoint.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 BASE_URL = "http://localhost/api/v1/ml"
 
+# One pooled session so consecutive calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+
 
 
 def test_build_tree(max_levels: int = 3, min_nodes_per_level: int = 3):
     print("\n=== Testing Build Tree ===")
     print(f"Parameters: max_levels={max_levels}, min_nodes_per_level={min_nodes_per_level}")
     
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/build_tree",
         params={
             "max_levels": max_levels,
@@ -48,7 +54,7 @@ def test_raptor_search(query: str = "machine learning", limit: int = 5):
     print(f"\n=== Testing RAPTOR Search ===")
     print(f"Query: '{query}'")
     
-    response = requests.get(
+    response = SESSION.get(
         f"{BASE_URL}/raptor_search",
         params={
             "query": query,
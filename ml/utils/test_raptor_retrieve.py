@@ -2,14 +2,24 @@ import os
 import sys
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
 import json
+from functools import lru_cache
 
 DEFAULT_API_URL = os.environ.get("API_URL", "http://localhost/api/v1")
 DEFAULT_TIMEOUT = 30
 
+# One pooled session so consecutive calls reuse the same connection
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=10))
+
+ML_SUFFIXES = ("/ml", "/api/v1/ml")
+
+@lru_cache(maxsize=None)
 def build_endpoint(base: str) -> str:
     b = base.rstrip("/")
-    if b.endswith("/ml") or b.endswith("/api/v1/ml"):
+    if b.endswith(ML_SUFFIXES):
         return f"{b}/raptor_search"
     return f"{b}/ml/raptor_search"
 
@@ -26,7 +36,7 @@ def call_raptor_search(api_base: str, query: str, paper_id: str = None,
 
     # headers = {}
 
-    resp = requests.get(url, params=params, timeout=timeout)
+    resp = SESSION.get(url, params=params, timeout=timeout)
     try:
         resp.raise_for_status()
     except requests.HTTPError:
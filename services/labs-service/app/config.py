@@ -15,6 +15,7 @@ class Config:
     # General config
     SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
     SERVICE_PORT = os.getenv("SERVICE_PORT", "50051")
+    GRPC_MAX_WORKERS = int(os.getenv("GRPC_MAX_WORKERS", "10"))  # RPCs served concurrently, one thread each
 
     # MinIO config
     MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "127.0.0.1:9000")
@@ -29,6 +30,9 @@ class Config:
     POSTGRESQL_HOST = os.getenv("POSTGRESQL_HOST", "postgres")
     POSTGRESQL_PORT = os.getenv("POSTGRESQL_PORT", "5433")
     POSTGRESQL_NAME = os.getenv("POSTGRESQL_NAME", "labs")
+    POSTGRESQL_DRIVER = os.getenv("POSTGRESQL_DRIVER", "psycopg2")  # "psycopg" enables server-side prepared statements
+    POSTGRESQL_POOL_SIZE = int(os.getenv("POSTGRESQL_POOL_SIZE", str(GRPC_MAX_WORKERS)))  # one connection per gRPC worker thread
+    POSTGRESQL_MAX_OVERFLOW = int(os.getenv("POSTGRESQL_MAX_OVERFLOW", "5"))
 
     # MongoDB config
     MONGODB_USER = os.getenv("MONGODB_USER", "mongo")
@@ -32,7 +32,7 @@ logging.basicConfig(
 
 if __name__ == "__main__":
     logger = logging.getLogger("__main__")
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=Config.GRPC_MAX_WORKERS))
 
     labs_service.add_LabServiceServicer_to_server(LabService(), server)
     submissions_service.add_SubmissionServiceServicer_to_server(SubmissionService(), server)
@@ -10,6 +10,7 @@ import json
 
 # Import project files
 from utils.models import Lab, LabAsset, ArticleRelation, Tag, LabTag
+from utils.cache import tag_cache
 import proto.labs_service_pb2 as labs_stub # Generated from labs.proto
 import proto.labs_service_pb2_grpc as labs_service # Generated from labs.proto
 from services.tools import Tools
@@ -131,6 +132,7 @@ class LabService(labs_service.LabServiceServicer):
                     tag.labs_count += 1
 
             session.commit()
+            tag_cache.invalidate(*request.tags_ids)
 
             self.logger.info(f"Created Lab with id={new_lab.id}, title={new_lab.title}")
 
@@ -267,8 +269,7 @@ class LabService(labs_service.LabServiceServicer):
             labs = session.execute(stmt).scalars().all()
 
             lab_list = labs_stub.LabList(total_count=len(labs))
-            for lab in labs:
-                lab_list.labs.append(labs_stub.Lab(**lab.get_attrs()))
+            lab_list.labs.extend(labs_stub.Lab(**lab.get_attrs()) for lab in labs)
 
             self.logger.info(f"Retrieved {len(labs)} labs, page {data['page_number']} of size {data['page_size']}")
 
@@ -337,8 +338,10 @@ class LabService(labs_service.LabServiceServicer):
 
                 lab.articles.extend([ArticleRelation(lab_id=lab.id, article_id=article_id) for article_id in data["related_articles_ids"]])
 
+            changed_tags_ids = []
             if data["tags_ids"] is not None:
                 existing_lab_tags = list(lab.tags)
+                changed_tags_ids = [lab_tag.tag_id for lab_tag in existing_lab_tags] + list(data["tags_ids"])
                 for lab_tag in existing_lab_tags:
                     stmt = select(Tag).where(Tag.id == lab_tag.tag_id)
                     tag = session.execute(stmt).scalar_one_or_none()
@@ -372,6 +375,7 @@ class LabService(labs_service.LabServiceServicer):
                     tag.labs_count += 1
 
             session.commit()
+            tag_cache.invalidate(*changed_tags_ids)
 
             self.logger.info(f"Updated Lab with id={lab.id}, title={lab.title}")
 
@@ -414,6 +418,7 @@ class LabService(labs_service.LabServiceServicer):
 
                 return labs_stub.DeleteLabResponse(success=False)
 
+            changed_tags_ids = [lab_tag.tag_id for lab_tag in lab.tags]
             for lab_tag in lab.tags:
                 stmt = select(Tag).where(Tag.id == lab_tag.tag_id)
                 tag = session.execute(stmt).scalar_one_or_none()
@@ -425,6 +430,7 @@ class LabService(labs_service.LabServiceServicer):
 
             session.delete(lab)
             session.commit()
+            tag_cache.invalidate(*changed_tags_ids)
 
             # Remove all assets from MinIO
             try:
@@ -502,8 +508,7 @@ class LabService(labs_service.LabServiceServicer):
             labs = session.execute(stmt).scalars().all()
 
             lab_list = labs_stub.LabList(total_count=len(labs))
-            for lab in labs:
-                lab_list.labs.append(labs_stub.Lab(**lab.get_attrs()))
+            lab_list.labs.extend(labs_stub.Lab(**lab.get_attrs()) for lab in labs)
 
             self.logger.info(f"Retrieved {len(labs)} labs for user with id={data['user_id']}")
 
@@ -1,7 +1,7 @@
 # Import downloaded modules
 import grpc
-from sqlalchemy.orm import Session
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 # Import built-in modules
 import os
@@ -9,15 +9,14 @@ import logging
 
 # Import project files
 from utils.models import Lab, LabAsset, ArticleRelation, Tag, LabTag
+from utils.cache import tag_cache
 import proto.tags_service_pb2 as tags_stub # Generated from tags.proto
 import proto.tags_service_pb2_grpc as tags_service # Generated from tags.proto
 from services.tools import Tools
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Columns emitted by Tag.get_attrs(); read paths select these directly and skip ORM hydration
+TAG_COLUMNS = (Tag.id, Tag.name, Tag.description, Tag.created_at, Tag.updated_at, Tag.labs_count)
 
 class TagService(tags_service.TagServiceServicer):
     def __init__(self):
@@ -25,6 +24,7 @@ class TagService(tags_service.TagServiceServicer):
         self.tools = Tools()
 
         self.engine = self.tools.get_postgresql_engine()
+        self.Session = self.tools.get_postgresql_sessionmaker()
 
     # Tags Management
     def CreateTag(self, request, context) -> tags_stub.Tag:
@@ -45,40 +45,34 @@ class TagService(tags_service.TagServiceServicer):
             ALREADY_EXISTS: If a tag with the same name already exists
         """
 
-        self.logger.info(f"CreateTag requested")
+        self.logger.info("CreateTag requested")
 
-        data: dict = {
-            "name": request.name,
-            "description": request.description,
-        }
-
-        if data["name"] is None or data["name"] == "":
+        if request.name == "":
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Name is required, got {data['name']}"
+            error_message = f"Name is required, got {request.name}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
             
             return tags_stub.Tag()
 
-        with Session(self.engine) as session:
-            stmt = select(Tag).where(Tag.name == data["name"])
-            tag = session.execute(stmt).scalar_one_or_none()
+        with self.Session() as session:
+            # Single round-trip: the unique index on name decides whether the row is new
+            stmt = insert(Tag).values(name=request.name, description=request.description).on_conflict_do_nothing(index_elements=[Tag.name]).returning(Tag)
+            new_tag = session.execute(stmt).scalar_one_or_none()
             
-            if tag is not None:
+            if new_tag is None:
                 context.set_code(grpc.StatusCode.ALREADY_EXISTS)
-                error_message = f"Tag with name '{data['name']}' already exists"
+                error_message = f"Tag with name '{request.name}' already exists"
                 context.set_details(error_message)
 
                 self.logger.error(error_message)
 
                 return tags_stub.Tag()
 
-            new_tag = Tag(**data)
-            session.add(new_tag)
             session.commit()
 
-            self.logger.info(f"Tag created: {new_tag.get_attrs()}")
+            self.logger.info("Tag created: id=%s, name=%s", new_tag.id, new_tag.name)
             
             return tags_stub.Tag(**new_tag.get_attrs())
             
@@ -100,37 +94,41 @@ class TagService(tags_service.TagServiceServicer):
             NOT_FOUND: If the tag does not exist
         """
 
-        data: dict = {
-            "tag_id": request.id
-        }
-
-        self.logger.info(f"GetTag requested")
+        self.logger.info("GetTag requested")
 
-        if data["tag_id"] is None:
+        if request.id <= 0:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Tag id is required, got {data['tag_id']}"
+            error_message = f"Tag id is required, got {request.id}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
             
             return tags_stub.Tag()
 
-        with Session(self.engine) as session:
-            stmt = select(Tag).where(Tag.id == data["tag_id"])
-            tag = session.execute(stmt).scalar_one_or_none()
+        attrs = tag_cache.get(request.id)
 
-            if tag is None:
-                context.set_code(grpc.StatusCode.NOT_FOUND)
-                error_message = f"Tag with id '{data['tag_id']}' not found"
-                context.set_details(error_message)
+        if attrs is None:
+            # Taken before the read so an UpdateTag committing meanwhile can't be overwritten by this row
+            generation = tag_cache.generation(request.id)
+            with self.Session() as session:
+                stmt = select(*TAG_COLUMNS).where(Tag.id == request.id)
+                row = session.execute(stmt).one_or_none()
 
-                self.logger.error(error_message)
+                if row is None:
+                    context.set_code(grpc.StatusCode.NOT_FOUND)
+                    error_message = f"Tag with id '{request.id}' not found"
+                    context.set_details(error_message)
 
-                return tags_stub.Tag()
+                    self.logger.error(error_message)
 
-            self.logger.info(f"Tag found: {tag.get_attrs()}")
+                    return tags_stub.Tag()
 
-            return tags_stub.Tag(**tag.get_attrs())
+                attrs = row._asdict()
+                tag_cache.set(request.id, attrs, generation)
+
+        self.logger.info("Tag found: %s", attrs)
+
+        return tags_stub.Tag(**attrs)
 
 
     def GetTags(self, request, context) -> tags_stub.TagList:
@@ -141,49 +139,54 @@ class TagService(tags_service.TagServiceServicer):
             request: GetTagsRequest containing:
                 - page_number (int): Page number (1-based)
                 - page_size (int): Number of tags per page
+                - after_id (int, optional): Return tags with id below this cursor instead of using page_number
             context: gRPC context
         
         Returns:
-            tags_stub.TagList: List of tags and count, or empty TagList on error
+            tags_stub.TagList: List of tags, count and next_cursor, or empty TagList on error
         
         Errors:
             INVALID_ARGUMENT: If page_number or page_size is invalid (≤ 0)
         """
 
-        data: dict = {
-            "page_number": request.page_number,
-            "page_size": request.page_size,
-        }
+        self.logger.info("GetTags requested")
 
-        self.logger.info(f"GetTags requested")
-
-        if data["page_number"] is None or data["page_number"] <= 0:
+        if not request.HasField("after_id") and request.page_number <= 0:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Page number must be greater than 0, got {data['page_number']}"
+            error_message = f"Page number must be greater than 0, got {request.page_number}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
 
             return tags_stub.TagList()
 
-        if data["page_size"] is None or data["page_size"] <= 0:
+        if request.page_size <= 0:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Page size must be greater than 0, got {data['page_size']}"
+            error_message = f"Page size must be greater than 0, got {request.page_size}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
 
             return tags_stub.TagList()
 
-        with Session(self.engine) as session:
-            stmt = select(Tag).order_by(Tag.id.desc()).offset((data["page_number"] - 1) * data["page_size"]).limit(data["page_size"])
-            tags = session.execute(stmt).scalars().all()
+        with self.Session() as session:
+            stmt = select(*TAG_COLUMNS).order_by(Tag.id.desc()).limit(request.page_size)
+
+            if request.HasField("after_id"):
+                # Keyset pagination: walks the primary key index, constant cost per page
+                stmt = stmt.where(Tag.id < request.after_id)
+            else:
+                stmt = stmt.offset((request.page_number - 1) * request.page_size)
 
-            tags_list = tags_stub.TagList(count=len(tags))
+            tags = session.execute(stmt).all()
+
+            # A short page is the last one; don't send the client after a page that doesn't exist
+            next_cursor = tags[-1].id if len(tags) == request.page_size else 0
+            tags_list = tags_stub.TagList(count=len(tags), next_cursor=next_cursor)
             for tag in tags:
-                tags_list.tags.append(tags_stub.Tag(**tag.get_attrs()))
+                tags_list.tags.add(**tag._asdict())
 
-            self.logger.info(f"Tags retrieved: {len(tags)}")
+            self.logger.info("Tags retrieved: %s", len(tags))
 
             return tags_list
 
@@ -205,27 +208,25 @@ class TagService(tags_service.TagServiceServicer):
             NOT_FOUND: If any tag ID does not exist
         """
 
-        data: dict = {
-            "tag_ids": request.ids
-        }
-
-        self.logger.info(f"GetTagsByIds requested")
+        self.logger.info("GetTagsByIds requested")
 
-        if data["tag_ids"] is None or len(data["tag_ids"]) == 0:
+        if len(request.ids) == 0:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Tag ids are required, got {data['tag_ids']}"
+            error_message = f"Tag ids are required, got {request.ids}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
 
             return tags_stub.TagList()
         
-        with Session(self.engine) as session:
-            tags_list = tags_stub.TagList(count=0)
+        with self.Session() as session:
+            stmt = select(*TAG_COLUMNS).where(Tag.id.in_(request.ids))
+            tags_by_id = {tag.id: tag for tag in session.execute(stmt)}
 
-            for tag_id in data["tag_ids"]:
-                stmt = select(Tag).where(Tag.id == tag_id)
-                tag = session.execute(stmt).scalar_one_or_none()
+            found_tags = []
+
+            for tag_id in request.ids:
+                tag = tags_by_id.get(tag_id)
 
                 if tag is None:
                     context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -236,10 +237,12 @@ class TagService(tags_service.TagServiceServicer):
 
                     return tags_stub.TagList()
 
-                tags_list.tags.append(tags_stub.Tag(**tag.get_attrs()))
-                tags_list.count += 1
+                found_tags.append(tags_stub.Tag(**tag._asdict()))
+
+            tags_list = tags_stub.TagList(count=len(found_tags))
+            tags_list.tags.extend(found_tags)
 
-            self.logger.info(f"Tags retrieved: {tags_list.count}")
+            self.logger.info("Tags retrieved: %s", tags_list.count)
 
             return tags_list
 
@@ -263,45 +266,43 @@ class TagService(tags_service.TagServiceServicer):
             NOT_FOUND: If the tag does not exist
         """
 
-        self.logger.info(f"UpdateTag requested")
-
-        data: dict = {
-            "tag_id": request.id,
-            "name": request.name if request.HasField("name") else None,
-            "description": request.description if request.HasField("description") else None,
-        }
+        self.logger.info("UpdateTag requested")
         
-        if data["name"] is not None and data["name"] == "":
+        if request.HasField("name") and request.name == "":
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
-            error_message = f"Name is required, got {data['name']}"
+            error_message = f"Name is required, got {request.name}"
             context.set_details(error_message)
 
             self.logger.error(error_message)
             
             return tags_stub.Tag()
 
-        with Session(self.engine) as session:
-            stmt = select(Tag).where(Tag.id == data["tag_id"])
-            tag = session.execute(stmt).scalar_one_or_none()
+        if not request.HasField("name") and not request.HasField("description"):
+            # Nothing to change: answer from the cached read path instead of opening a transaction
+            return self.GetTag(request, context)
+
+        with self.Session() as session:
+            tag = session.get(Tag, request.id)
 
             if tag is None:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
-                error_message = f"Tag with id '{data['tag_id']}' not found"
+                error_message = f"Tag with id '{request.id}' not found"
                 context.set_details(error_message)
 
                 self.logger.error(error_message)
 
                 return tags_stub.Tag()
             
-            if data["name"] is not None:
-                tag.name = data["name"]
+            if request.HasField("name"):
+                tag.name = request.name
 
-            if data["description"] is not None:
-                tag.description = data["description"]
+            if request.HasField("description"):
+                tag.description = request.description
 
             session.commit()
+            tag_cache.invalidate(request.id)
 
-            self.logger.info(f"Updated Tag with id={tag.id}, name={tag.name}")
+            self.logger.info("Updated Tag with id=%s, name=%s", tag.id, tag.name)
 
             return tags_stub.Tag(**tag.get_attrs())
 
@@ -318,22 +319,27 @@ class TagService(tags_service.TagServiceServicer):
             tags_stub.DeleteTagResponse: Success status of the deletion
         
         Errors:
+            INVALID_ARGUMENT: If tag ID is missing
             NOT_FOUND: If the tag does not exist
         """
         
-        self.logger.info(f"DeleteTag requested")
+        self.logger.info("DeleteTag requested")
+
+        if request.id <= 0:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            error_message = f"Tag id is required, got {request.id}"
+            context.set_details(error_message)
+
+            self.logger.error(error_message)
 
-        data: dict = {
-            "tag_id": request.id
-        }
+            return tags_stub.DeleteTagResponse(success=False)
 
-        with Session(self.engine) as session:
-            stmt = select(Tag).where(Tag.id == data["tag_id"])
-            tag = session.execute(stmt).scalar_one_or_none()
+        with self.Session() as session:
+            tag = session.get(Tag, request.id)
 
             if tag is None:
                 context.set_code(grpc.StatusCode.NOT_FOUND)
-                error_message = f"Tag with id '{data['tag_id']}' not found"
+                error_message = f"Tag with id '{request.id}' not found"
                 context.set_details(error_message)
 
                 self.logger.error(error_message)
@@ -342,8 +348,9 @@ class TagService(tags_service.TagServiceServicer):
             
             session.delete(tag)
             session.commit()
+            tag_cache.invalidate(request.id)
 
-            self.logger.info(f"Tag deleted: {tag.id}")
+            self.logger.info("Tag deleted: %s", tag.id)
             
             return tags_stub.DeleteTagResponse(success=True)
 
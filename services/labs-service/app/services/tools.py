@@ -3,6 +3,7 @@ import minio
 from pymongo import MongoClient
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
 
 # Import built-in modules
 import logging
@@ -20,6 +21,7 @@ class Tools:
     _minio_client = None
     _mongo_client = None
     _postgresql_engine = None
+    _postgresql_sessionmaker = None
     _instance = None
 
     def __init__(self):
@@ -58,13 +60,32 @@ class Tools:
             host = Config.POSTGRESQL_HOST
             port = Config.POSTGRESQL_PORT
             db_name = Config.POSTGRESQL_NAME
-            url = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
+            driver = Config.POSTGRESQL_DRIVER
+            url = f"postgresql+{driver}://{user}:{password}@{host}:{port}/{db_name}"
+
+            # psycopg 3 can prepare every statement server-side so repeated
+            # query shapes skip planning; psycopg2 has no such option
+            connect_args = {"prepare_threshold": 0} if driver == "psycopg" else {}
 
             self.logger.info(f"Connecting to PostgreSQL at {url}")
-            self._postgresql_engine = create_engine(url, echo=False)
+            # One engine per process: Tools is a singleton, so every servicer shares this pool
+            self._postgresql_engine = create_engine(
+                url,
+                echo=False,
+                connect_args=connect_args,
+                pool_size=Config.POSTGRESQL_POOL_SIZE,
+                max_overflow=Config.POSTGRESQL_MAX_OVERFLOW,
+                pool_pre_ping=True
+            )
 
             # Create tables if they don't exist
             from utils.models import Base
             Base.metadata.create_all(self._postgresql_engine)
 
-        return self._postgresql_engine
\ No newline at end of file
+        return self._postgresql_engine
+
+    def get_postgresql_sessionmaker(self) -> sessionmaker:
+        if self._postgresql_sessionmaker is None:
+            # Objects stay loaded after commit, so building a response from them doesn't re-SELECT
+            self._postgresql_sessionmaker = sessionmaker(bind=self.get_postgresql_engine(), expire_on_commit=False)
+        return self._postgresql_sessionmaker
@@ -0,0 +1,50 @@
+# Import built-in modules
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used mapping, safe to share between gRPC worker threads.
+
+    Every invalidate() bumps the key's generation. A reader that takes generation()
+    before loading a value and passes it to set() can't store data read before a
+    concurrent invalidate().
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, key) -> int:
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value, generation=None) -> None:
+        with self._lock:
+            # Invalidated since the caller started reading: the value may be stale
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+
+# Tag attrs by tag id; any code that changes a tag row must invalidate its id
+tag_cache = LRUCache(maxsize=1024)
@@ -6,6 +6,9 @@ load_dotenv()
 class Config:
     # Service configuration
     GRPC_PORT = int(os.getenv('GRPC_PORT', '9095'))
+    # Each worker thread is one in-flight RPC; more threads absorb bursts at the cost of memory per thread
+    GRPC_MAX_WORKERS = int(os.getenv('GRPC_MAX_WORKERS', str(min(32, (os.cpu_count() or 1) * 4))))
+    GRPC_MAX_CONCURRENT_STREAMS = int(os.getenv('GRPC_MAX_CONCURRENT_STREAMS', '1000'))
     MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', '100'))
     SESSION_TIMEOUT_MINUTES = int(os.getenv('SESSION_TIMEOUT_MINUTES', '240'))
 
@@ -15,20 +18,29 @@ class Config:
     MINIO_SECRET_KEY = os.getenv('MINIO_SECRET_KEY', 'minioadmin')
     MINIO_BUCKET = os.getenv('MINIO_BUCKET', 'marimo')
     MINIO_SECURE = os.getenv('MINIO_SECURE', 'false').lower() == 'true'
+    # Concurrent fget_object calls when copying a component's assets into a session; the MinIO client pools 10 connections
+    ASSET_DOWNLOAD_WORKERS = int(os.getenv('ASSET_DOWNLOAD_WORKERS', '10'))
+    # Assets larger than this are fetched as parallel byte ranges of this size
+    ASSET_RANGE_CHUNK_BYTES = int(os.getenv('ASSET_RANGE_CHUNK_BYTES', str(16 * 1024 * 1024)))
+    # Byte-range GETs in flight at once, across all large assets; they share the ASSET_DOWNLOAD_WORKERS pool
+    ASSET_RANGE_CONCURRENCY = int(os.getenv('ASSET_RANGE_CONCURRENCY', '8'))
 
     # Security configuration
-    ALLOWED_IMPORTS = {
+    ALLOWED_IMPORTS = frozenset({
         'numpy', 'pandas', 'matplotlib', 'plotly',
         'marimo', 'math', 'statistics', 'random',
         'datetime', 'json', 'scipy', 'seaborn'
-    }
+    })
     
-    BLOCKED_MODULES = {
+    BLOCKED_MODULES = frozenset({
         'os', 'subprocess', 'sys', 'socket',
         'urllib', 'requests', 'http', 'builtins'
-    }
+    })
 
     # Performance configuration
     MAX_CODE_LENGTH = int(os.getenv('MAX_CODE_LENGTH', '25000'))
     WEBGL_THRESHOLD = int(os.getenv('WEBGL_THRESHOLD', '1000'))
+    ARRAY_DISPLAY_THRESHOLD = int(os.getenv('ARRAY_DISPLAY_THRESHOLD', '1000'))  # arrays with more elements are summarized
     MAX_OUTPUT_SIZE_MB = int(os.getenv('MAX_OUTPUT_SIZE_MB', '50'))
+    # compile() optimize level for cell code: -1 follows the interpreter, 2 strips asserts and docstrings
+    CELL_OPTIMIZE_LEVEL = int(os.getenv('CELL_OPTIMIZE_LEVEL', '-1'))
@@ -1,7 +1,9 @@
 import os
 import sys
+import json
 import grpc
 from concurrent import futures
+from functools import lru_cache
 
 # Add the generated gRPC code directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'proto'))
@@ -9,40 +11,108 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'proto'))
 from config import Config
 from service.session import SessionManager
 from service.executor import MarimoCellExecutor
+from service.widget_updates import WidgetUpdateCoalescer
 from service.logging_config import setup_logging, get_logger
 
 # Import generated gRPC code
 import marimo_executor_service_pb2 as marimo_service_pb2
 import marimo_executor_service_pb2_grpc as marimo_service_pb2_grpc
 
+# Executor output/data type strings -> protobuf enums, built once at import
+_OT = marimo_service_pb2.CellOutput.OutputType
+_DT = marimo_service_pb2.CellOutput.DataType
+_DEFAULT_OT = _OT.TEXT
+_DEFAULT_DT = _DT.TEXT_DATA
+
+_OUTPUT_TYPE_MAP = {
+    'TEXT': _OT.TEXT,
+    'STDOUT': _OT.STDOUT,
+    'STDERR': _OT.STDERR,
+    'EXPRESSION_RESULT': _OT.EXPRESSION_RESULT,
+    'ERROR': _OT.ERROR,
+    'HTML': _OT.HTML,
+    'PLOT': _OT.PLOT,
+    'WIDGET': _OT.WIDGET,
+}
+
+_DATA_TYPE_MAP = {
+    'TEXT': _DT.TEXT_DATA,
+    'HTML': _DT.HTML_DATA,
+    'JSON': _DT.JSON_DATA,
+    'IMAGE': _DT.IMAGE_DATA,
+}
+
+@lru_cache(maxsize=1024)
+def _coerce_widget_value(widget_type, raw_value):
+    """
+    Parse a raw widget value and coerce it to the widget's type.
+
+    Cached because sliders and similar widgets resend the same raw strings
+    many times per second. Raises ValueError/TypeError for an invalid number
+    so the caller can fall back to the widget's current value.
+    """
+    # Try to parse JSON for complex values
+    try:
+        widget_value = json.loads(raw_value)
+    except (json.JSONDecodeError, ValueError):
+        # If not valid JSON, keep as string
+        widget_value = raw_value
+
+    # Type-specific validation and conversion
+    if widget_type == 'number':
+        if widget_value is None or widget_value == '':
+            widget_value = 0
+        elif isinstance(widget_value, str) or not isinstance(widget_value, (int, float)):
+            widget_value = float(widget_value)
+
+    elif widget_type == 'checkbox':
+        widget_value = bool(widget_value)
+
+    elif widget_type in ['dropdown', 'radio']:
+        # Single selection widgets - ensure string value
+        if widget_value is None:
+            widget_value = ''
+        else:
+            widget_value = str(widget_value)
+
+    elif widget_type == 'multiselect':
+        # Multi-selection widget - ensure list
+        if not isinstance(widget_value, list):
+            if widget_value is None:
+                widget_value = []
+            else:
+                widget_value = [widget_value]  # Wrap single value in list
+
+    elif widget_type == 'range_slider':
+        if not isinstance(widget_value, list) or len(widget_value) != 2:
+            widget_value = [0, 100]  # Default range
+
+    return widget_value
+
 class MarimoExecutorService(marimo_service_pb2_grpc.MarimoExecutorServicer):
     def __init__(self):
         self.session_manager = SessionManager()
+        self.widget_updates = WidgetUpdateCoalescer()
         self.logger = get_logger("grpc_service")
 
     def _map_output_type(self, output_type_str):
         """Map string output type to protobuf enum."""
-        type_mapping = {
-            'TEXT': marimo_service_pb2.CellOutput.OutputType.TEXT,
-            'STDOUT': marimo_service_pb2.CellOutput.OutputType.STDOUT,
-            'STDERR': marimo_service_pb2.CellOutput.OutputType.STDERR,
-            'EXPRESSION_RESULT': marimo_service_pb2.CellOutput.OutputType.EXPRESSION_RESULT,
-            'ERROR': marimo_service_pb2.CellOutput.OutputType.ERROR,
-            'HTML': marimo_service_pb2.CellOutput.OutputType.HTML,
-            'PLOT': marimo_service_pb2.CellOutput.OutputType.PLOT,
-            'WIDGET': marimo_service_pb2.CellOutput.OutputType.WIDGET,
-        }
-        return type_mapping.get(output_type_str, marimo_service_pb2.CellOutput.OutputType.TEXT)
+        return _OUTPUT_TYPE_MAP.get(output_type_str, _DEFAULT_OT)
 
     def _map_data_type(self, data_type_str):
         """Map string data type to protobuf enum."""
-        type_mapping = {
-            'TEXT': marimo_service_pb2.CellOutput.DataType.TEXT_DATA,
-            'HTML': marimo_service_pb2.CellOutput.DataType.HTML_DATA,
-            'JSON': marimo_service_pb2.CellOutput.DataType.JSON_DATA,
-            'IMAGE': marimo_service_pb2.CellOutput.DataType.IMAGE_DATA,
-        }
-        return type_mapping.get(data_type_str, marimo_service_pb2.CellOutput.DataType.TEXT_DATA)
+        return _DATA_TYPE_MAP.get(data_type_str, _DEFAULT_DT)
+
+    def _add_proto_output(self, outputs, output):
+        """Append an executor output dict to a repeated CellOutput field, built in place."""
+        outputs.add(
+            type=self._map_output_type(output.get('type', 'TEXT')),
+            content=output.get('content', ''),
+            data=output.get('data', b''),
+            mime_type=output.get('mime_type', 'text/plain'),
+            metadata=output.get('metadata', {}),
+            data_type=self._map_data_type(output.get('data_type', 'TEXT'))
+        )
 
     def StartSession(self, request, context):
         try:
@@ -80,36 +150,65 @@ class MarimoExecutorService(marimo_service_pb2_grpc.MarimoExecutorServicer):
                 request.code
             )
 
-            # Convert outputs to protobuf format
-            proto_outputs = []
-            for output in outputs:
-                # Map output types to protobuf enums
-                output_type = self._map_output_type(output.get('type', 'TEXT'))
-                data_type = self._map_data_type(output.get('data_type', 'TEXT'))
-                
-                proto_output = marimo_service_pb2.CellOutput(
-                    type=output_type,
-                    content=output.get('content', ''),
-                    data=output.get('data', b''),
-                    mime_type=output.get('mime_type', 'text/plain'),
-                    metadata=output.get('metadata', {}),
-                    data_type=data_type
-                )
-                proto_outputs.append(proto_output)
-
-            return marimo_service_pb2.ExecuteResponse(
+            response = marimo_service_pb2.ExecuteResponse(
                 success=success,
-                outputs=proto_outputs,
                 error=error,
                 cell_state=cell_state
             )
 
+            # Convert outputs to protobuf format
+            for output in outputs:
+                self._add_proto_output(response.outputs, output)
+
+            return response
+
         except Exception as e:
             return marimo_service_pb2.ExecuteResponse(
                 success=False,
                 error=str(e)
             )
 
+    def ExecuteCellStream(self, request, context):
+        """
+        Stream each cell output as its own ExecuteResponse once the cell has run.
+        The final message carries no outputs, only success/error/cell_state.
+        """
+        session = self.session_manager.get_session(request.session_id)
+        if not session:
+            yield marimo_service_pb2.ExecuteResponse(
+                success=False,
+                error="Session not found"
+            )
+            return
+
+        executor = MarimoCellExecutor(session)
+        stream = executor.execute_cell_stream(request.cell_id, request.code)
+        try:
+            while True:
+                try:
+                    output = next(stream)
+                except StopIteration as done:
+                    success, error, cell_state = done.value
+                    break
+                response = marimo_service_pb2.ExecuteResponse(success=True)
+                self._add_proto_output(response.outputs, output)
+                yield response
+        except Exception as e:
+            yield marimo_service_pb2.ExecuteResponse(
+                success=False,
+                error=str(e)
+            )
+            return
+        finally:
+            # Restores stdout/cwd inside the executor if the client cancelled mid-stream
+            stream.close()
+
+        yield marimo_service_pb2.ExecuteResponse(
+            success=success,
+            error=error,
+            cell_state=cell_state
+        )
+
     def EndSession(self, request, context):
         try:
             self.session_manager.end_session(request.session_id)
@@ -152,61 +251,25 @@ class MarimoExecutorService(marimo_service_pb2_grpc.MarimoExecutorServicer):
                     error="Session not found"
                 )
             
-            # Parse the value based on widget type
-            widget_value = request.value
-            
             # Get widget info to determine type
             widget_info = session.widgets.get(request.widget_id)
             widget_type = widget_info['type'] if widget_info else 'unknown'
             
-            # Try to parse JSON for complex values
+            # Parse the value based on widget type
             try:
-                import json
-                widget_value = json.loads(request.value)
-            except (json.JSONDecodeError, ValueError):
-                # If not valid JSON, keep as string
-                widget_value = request.value
-            
-            # Type-specific validation and conversion
-            if widget_type == 'number':
-                try:
-                    if widget_value is None or widget_value == '':
-                        widget_value = 0
-                    elif isinstance(widget_value, str):
-                        widget_value = float(widget_value)
-                    elif not isinstance(widget_value, (int, float)):
-                        widget_value = float(widget_value)
-                except (ValueError, TypeError):
-                    # If conversion fails, use default value or previous value
-                    widget_value = widget_info.get('value', 0) if widget_info else 0
-                    self.logger.warning(f"Invalid number value for widget {request.widget_id}, using default: {widget_value}")
+                widget_value = _coerce_widget_value(widget_type, request.value)
+            except (ValueError, TypeError):
+                # If conversion fails, use default value or previous value
+                widget_value = widget_info.get('value', 0) if widget_info else 0
+                self.logger.warning(f"Invalid number value for widget {request.widget_id}, using default: {widget_value}")
             
-            elif widget_type == 'checkbox':
-                widget_value = bool(widget_value)
+            # Cached values are shared between calls, hand the session its own container
+            if isinstance(widget_value, (list, dict)):
+                widget_value = widget_value.copy()
             
-            elif widget_type in ['dropdown', 'radio']:
-                # Single selection widgets - ensure string value
-                if widget_value is None:
-                    widget_value = ''
-                else:
-                    widget_value = str(widget_value)
-            
-            elif widget_type == 'multiselect':
-                # Multi-selection widget - ensure list
-                if not isinstance(widget_value, list):
-                    if widget_value is None:
-                        widget_value = []
-                    else:
-                        widget_value = [widget_value]  # Wrap single value in list
-            
-            elif widget_type == 'range_slider':
-                if not isinstance(widget_value, list) or len(widget_value) != 2:
-                    widget_value = [0, 100]  # Default range
-            
-            # Update widget value in session
-            session.update_widget_value(request.widget_id, widget_value)
-            
-            self.logger.info(f"Updated widget {request.widget_id} to value: {widget_value}")
+            # Applied before we reply; a concurrent newer value for the same widget wins
+            if self.widget_updates.submit(session, request.widget_id, widget_value):
+                self.logger.info(f"Updated widget {request.widget_id} to value: {widget_value}")
             
             return marimo_service_pb2.UpdateWidgetValueResponse(
                 success=True,
@@ -228,7 +291,13 @@ def serve():
     )
 
     # Create gRPC server
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=Config.GRPC_MAX_WORKERS),
+        options=[
+            ('grpc.so_reuseport', 1),
+            ('grpc.max_concurrent_streams', Config.GRPC_MAX_CONCURRENT_STREAMS),
+        ]
+    )
     marimo_service_pb2_grpc.add_MarimoExecutorServicer_to_server(
         MarimoExecutorService(), server
     )
@@ -238,7 +307,7 @@ def serve():
 
     # Start server
     server.start()
-    logger.info(f'Marimo Python Service started on port {Config.GRPC_PORT}')
+    logger.info(f'Marimo Python Service started on port {Config.GRPC_PORT} with {Config.GRPC_MAX_WORKERS} workers')
 
     # Keep alive
     server.wait_for_termination()
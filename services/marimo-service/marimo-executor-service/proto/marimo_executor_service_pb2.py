@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1dmarimo_executor_service.proto\x12\x06marimo\"l\n\x13StartSessionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x15\n\rnotebook_path\x18\x02 \x01(\t\x12\x19\n\x0c\x63omponent_id\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x0f\n\r_component_id\"6\n\x14StartSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"C\n\x0e\x45xecuteRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63\x65ll_id\x18\x02 \x01(\t\x12\x0c\n\x04\x63ode\x18\x03 \x01(\t\"\xbb\x03\n\nCellOutput\x12+\n\x04type\x18\x01 \x01(\x0e\x32\x1d.marimo.CellOutput.OutputType\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\x11\n\tmime_type\x18\x04 \x01(\t\x12\x32\n\x08metadata\x18\x05 \x03(\x0b\x32 .marimo.CellOutput.MetadataEntry\x12.\n\tdata_type\x18\x06 \x01(\x0e\x32\x1b.marimo.CellOutput.DataType\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"p\n\nOutputType\x12\x08\n\x04TEXT\x10\x00\x12\x08\n\x04PLOT\x10\x01\x12\x08\n\x04HTML\x10\x02\x12\n\n\x06WIDGET\x10\x03\x12\t\n\x05\x45RROR\x10\x04\x12\n\n\x06STDOUT\x10\x05\x12\n\n\x06STDERR\x10\x06\x12\x15\n\x11\x45XPRESSION_RESULT\x10\x07\"G\n\x08\x44\x61taType\x12\r\n\tTEXT_DATA\x10\x00\x12\r\n\tHTML_DATA\x10\x01\x12\r\n\tJSON_DATA\x10\x02\x12\x0e\n\nIMAGE_DATA\x10\x03\"\xc4\x01\n\x0f\x45xecuteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12#\n\x07outputs\x18\x02 \x03(\x0b\x32\x12.marimo.CellOutput\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x12:\n\ncell_state\x18\x04 \x03(\x0b\x32&.marimo.ExecuteResponse.CellStateEntry\x1a\x30\n\x0e\x43\x65llStateEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\'\n\x11\x45ndSessionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"4\n\x12\x45ndSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\")\n\x13SessionStateRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"\x8c\x01\n\x14SessionStateResponse\x12\x0e\n\x06\x65xists\x18\x01 \x01(\x08\x12\x36\n\x05state\x18\x02 \x03(\x0b\x32\'.marimo.SessionStateResponse.StateEntry\x1a,\n\nStateEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"P\n\x18UpdateWidgetValueRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x11\n\twidget_id\x18\x02 \x01(\t\x12\r\n\x05value\x18\x03 \x01(\t\";\n\x19UpdateWidgetValueResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t2\x88\x03\n\x0eMarimoExecutor\x12I\n\x0cStartSession\x12\x1b.marimo.StartSessionRequest\x1a\x1c.marimo.StartSessionResponse\x12>\n\x0b\x45xecuteCell\x12\x16.marimo.ExecuteRequest\x1a\x17.marimo.ExecuteResponse\x12\x43\n\nEndSession\x12\x19.marimo.EndSessionRequest\x1a\x1a.marimo.EndSessionResponse\x12L\n\x0fGetSessionState\x12\x1b.marimo.SessionStateRequest\x1a\x1c.marimo.SessionStateResponse\x12X\n\x11UpdateWidgetValue\x12 .marimo.UpdateWidgetValueRequest\x1a!.marimo.UpdateWidgetValueResponseBA\n%olsh.backend.marimoservice.grpc.protoB\x18PythonMarimoServiceProtob\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1dmarimo_executor_service.proto\x12\x06marimo\"l\n\x13StartSessionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x15\n\rnotebook_path\x18\x02 \x01(\t\x12\x19\n\x0c\x63omponent_id\x18\x03 \x01(\tH\x00\x88\x01\x01\x42\x0f\n\r_component_id\"6\n\x14StartSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"C\n\x0e\x45xecuteRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0f\n\x07\x63\x65ll_id\x18\x02 \x01(\t\x12\x0c\n\x04\x63ode\x18\x03 \x01(\t\"\xbb\x03\n\nCellOutput\x12+\n\x04type\x18\x01 \x01(\x0e\x32\x1d.marimo.CellOutput.OutputType\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\x11\n\tmime_type\x18\x04 \x01(\t\x12\x32\n\x08metadata\x18\x05 \x03(\x0b\x32 .marimo.CellOutput.MetadataEntry\x12.\n\tdata_type\x18\x06 \x01(\x0e\x32\x1b.marimo.CellOutput.DataType\x1a/\n\rMetadataEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"p\n\nOutputType\x12\x08\n\x04TEXT\x10\x00\x12\x08\n\x04PLOT\x10\x01\x12\x08\n\x04HTML\x10\x02\x12\n\n\x06WIDGET\x10\x03\x12\t\n\x05\x45RROR\x10\x04\x12\n\n\x06STDOUT\x10\x05\x12\n\n\x06STDERR\x10\x06\x12\x15\n\x11\x45XPRESSION_RESULT\x10\x07\"G\n\x08\x44\x61taType\x12\r\n\tTEXT_DATA\x10\x00\x12\r\n\tHTML_DATA\x10\x01\x12\r\n\tJSON_DATA\x10\x02\x12\x0e\n\nIMAGE_DATA\x10\x03\"\xc4\x01\n\x0f\x45xecuteResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12#\n\x07outputs\x18\x02 \x03(\x0b\x32\x12.marimo.CellOutput\x12\r\n\x05\x65rror\x18\x03 \x01(\t\x12:\n\ncell_state\x18\x04 \x03(\x0b\x32&.marimo.ExecuteResponse.CellStateEntry\x1a\x30\n\x0e\x43\x65llStateEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\'\n\x11\x45ndSessionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"4\n\x12\x45ndSessionResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\")\n\x13SessionStateRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"\x8c\x01\n\x14SessionStateResponse\x12\x0e\n\x06\x65xists\x18\x01 \x01(\x08\x12\x36\n\x05state\x18\x02 \x03(\x0b\x32\'.marimo.SessionStateResponse.StateEntry\x1a,\n\nStateEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"P\n\x18UpdateWidgetValueRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x11\n\twidget_id\x18\x02 \x01(\t\x12\r\n\x05value\x18\x03 \x01(\t\";\n\x19UpdateWidgetValueResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t2\xd0\x03\n\x0eMarimoExecutor\x12I\n\x0cStartSession\x12\x1b.marimo.StartSessionRequest\x1a\x1c.marimo.StartSessionResponse\x12>\n\x0b\x45xecuteCell\x12\x16.marimo.ExecuteRequest\x1a\x17.marimo.ExecuteResponse\x12\x46\n\x11\x45xecuteCellStream\x12\x16.marimo.ExecuteRequest\x1a\x17.marimo.ExecuteResponse0\x01\x12\x43\n\nEndSession\x12\x19.marimo.EndSessionRequest\x1a\x1a.marimo.EndSessionResponse\x12L\n\x0fGetSessionState\x12\x1b.marimo.SessionStateRequest\x1a\x1c.marimo.SessionStateResponse\x12X\n\x11UpdateWidgetValue\x12 .marimo.UpdateWidgetValueRequest\x1a!.marimo.UpdateWidgetValueResponseBA\n%olsh.backend.marimoservice.grpc.protoB\x18PythonMarimoServiceProtob\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -71,5 +71,5 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_UPDATEWIDGETVALUERESPONSE']._serialized_start=1284
   _globals['_UPDATEWIDGETVALUERESPONSE']._serialized_end=1343
   _globals['_MARIMOEXECUTOR']._serialized_start=1346
-  _globals['_MARIMOEXECUTOR']._serialized_end=1738
+  _globals['_MARIMOEXECUTOR']._serialized_end=1810
 # @@protoc_insertion_point(module_scope)
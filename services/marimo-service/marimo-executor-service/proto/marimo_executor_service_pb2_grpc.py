@@ -44,6 +44,11 @@ class MarimoExecutorStub(object):
                 request_serializer=marimo__executor__service__pb2.ExecuteRequest.SerializeToString,
                 response_deserializer=marimo__executor__service__pb2.ExecuteResponse.FromString,
                 _registered_method=True)
+        self.ExecuteCellStream = channel.unary_stream(
+                '/marimo.MarimoExecutor/ExecuteCellStream',
+                request_serializer=marimo__executor__service__pb2.ExecuteRequest.SerializeToString,
+                response_deserializer=marimo__executor__service__pb2.ExecuteResponse.FromString,
+                _registered_method=True)
         self.EndSession = channel.unary_unary(
                 '/marimo.MarimoExecutor/EndSession',
                 request_serializer=marimo__executor__service__pb2.EndSessionRequest.SerializeToString,
@@ -76,6 +81,13 @@ class MarimoExecutorServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ExecuteCellStream(self, request, context):
+        """Streams one ExecuteResponse per output, then a final one with success/error/cell_state
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def EndSession(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -107,6 +119,11 @@ def add_MarimoExecutorServicer_to_server(servicer, server):
                     request_deserializer=marimo__executor__service__pb2.ExecuteRequest.FromString,
                     response_serializer=marimo__executor__service__pb2.ExecuteResponse.SerializeToString,
             ),
+            'ExecuteCellStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExecuteCellStream,
+                    request_deserializer=marimo__executor__service__pb2.ExecuteRequest.FromString,
+                    response_serializer=marimo__executor__service__pb2.ExecuteResponse.SerializeToString,
+            ),
             'EndSession': grpc.unary_unary_rpc_method_handler(
                     servicer.EndSession,
                     request_deserializer=marimo__executor__service__pb2.EndSessionRequest.FromString,
@@ -187,6 +204,33 @@ class MarimoExecutor(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def ExecuteCellStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/marimo.MarimoExecutor/ExecuteCellStream',
+            marimo__executor__service__pb2.ExecuteRequest.SerializeToString,
+            marimo__executor__service__pb2.ExecuteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def EndSession(request,
             target,
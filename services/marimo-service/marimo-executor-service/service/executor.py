@@ -2,39 +2,425 @@ import io
 import sys
 import os
 import traceback
+import linecache
+import reprlib
+import operator
+import types
+import threading
+import weakref
+from contextlib import ExitStack, chdir, closing, redirect_stderr, redirect_stdout
 import ast
-import base64
-import json
 import hashlib
-from typing import Any, Dict, List, Tuple, TYPE_CHECKING, Set, Optional
+import json
+from functools import lru_cache
+from types import CodeType
+from typing import Any, Callable, Dict, FrozenSet, Generator, List, Tuple, TYPE_CHECKING, Set, Optional
 import marimo as mo
+from config import Config
 
-from .security import SecurityValidator
+from .security import SecurityValidator, parse_code
 from .logging_config import get_logger
+from .session import _analyze_code, widget_characteristics_hash
 
 if TYPE_CHECKING:
     from .session import NotebookSession
 
+# Output types captured from stdout/stderr for the whole cell run
+CONSOLE_OUTPUT_TYPES = ('STDOUT', 'STDERR')
+
+# Bounded repr for cell_state: containers are shown up to 10 items and 2 levels deep, strings/other objects up to 200 chars
+CELL_STATE_REPR = reprlib.Repr()
+CELL_STATE_REPR.maxstring = CELL_STATE_REPR.maxother = 200
+CELL_STATE_REPR.maxlist = CELL_STATE_REPR.maxdict = CELL_STATE_REPR.maxtuple = 10
+CELL_STATE_REPR.maxset = CELL_STATE_REPR.maxfrozenset = CELL_STATE_REPR.maxdeque = 10
+CELL_STATE_REPR.maxlevel = 2
+# Names and value types left out of cell_state: interpreter helpers, and modules/functions/classes whose repr is noise
+CELL_STATE_EXCLUDED_NAMES = frozenset({'In', 'Out', 'exit', 'quit', 'get_ipython', 'mo'})
+CELL_STATE_SKIPPED_TYPES = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
+
+# Class-name fragment -> widget type, in match order (range_slider before slider, multiselect before select)
+CLASS_NAME_WIDGET_TYPES = (
+    ('range_slider', 'range_slider'),
+    ('slider', 'slider'),
+    ('button', 'button'),
+    ('text', 'text'),
+    ('checkbox', 'checkbox'),
+    ('radio', 'radio'),
+    ('multiselect', 'multiselect'),
+    ('dropdown', 'dropdown'),
+    ('select', 'dropdown'),
+    ('number', 'number'),
+)
+MARIMO_WIDGET_CLASS_HINTS = ('slider', 'button', 'text', 'checkbox', 'dropdown', 'select', 'radio', 'multiselect', 'number')
+
+# Where _extract_widget_properties reads each widget type's properties, applied in order (later sources win):
+#   ('attr', ((property, attribute), ...))         attributes of the widget object
+#   ('args', ((property, index), ...))             non-None positional arguments kept in obj._args
+#   ('args_config', (index, ((property, key), ...)))  keys of a dict kept at obj._args[index]
+WIDGET_PROPERTY_SOURCES = {
+    'range_slider': (
+        # start/stop map to min/max for frontend compatibility
+        ('attr', (('min', 'start'), ('max', 'stop'), ('step', 'step'))),
+        ('args_config', (4, (('min', 'start'), ('max', 'stop'), ('step', 'step')))),
+    ),
+    'slider': (
+        ('attr', (('min', 'min'), ('max', 'max'), ('step', 'step'))),
+        # mo.ui.slider(start, stop, step=1, value=None, label="", ...)
+        ('args', (('min', 0), ('max', 1), ('step', 2))),
+        # Alternative attribute names that marimo might use
+        ('attr', (('min', 'start'), ('max', 'stop'))),
+    ),
+    'text': (
+        ('attr', (('placeholder', 'placeholder'), ('maxLength', 'max_length'))),
+        # mo.ui.text(value="", placeholder="", label="", ...), additional parameters might be in kwargs
+        ('args', (('placeholder', 1),)),
+        ('args_config', (3, (('placeholder', 'placeholder'), ('maxLength', 'max_length')))),
+    ),
+    'number': (
+        ('attr', (('min', 'min'), ('max', 'max'), ('step', 'step'))),
+        # mo.ui.number(start=0, stop=100, step=1, value=None, label="", ...)
+        ('args', (('min', 0), ('max', 1), ('step', 2))),
+    ),
+    'button': (
+        ('attr', (('kind', 'kind'),)),
+    ),
+}
+# Bare function names recognised as widget constructors in cell source
+WIDGET_FUNCTION_NAMES = frozenset(MARIMO_WIDGET_CLASS_HINTS)
+OPTIONS_WIDGET_TYPES = frozenset({'dropdown', 'select', 'radio', 'multiselect'})
+
+_MISSING = object()
+
+def _widget_attr(obj: Any, obj_dict: Optional[Dict[str, Any]], name: str) -> Any:
+    """obj.name, read from the instance dict when it's there; _MISSING if absent"""
+    if obj_dict is not None and name in obj_dict:
+        return obj_dict[name]
+    return getattr(obj, name, _MISSING)
+
+# One C-level getter per multi-attribute 'attr' source, fetching all of its attributes in a single call
+_ATTR_SOURCE_GETTERS = {
+    spec: operator.attrgetter(*(attr for _, attr in spec))
+    for sources in WIDGET_PROPERTY_SOURCES.values()
+    for source, spec in sources
+    if source == 'attr' and len(spec) > 1
+}
+
+def _widget_attrs(obj: Any, obj_dict: Optional[Dict[str, Any]], spec: Tuple[Tuple[str, str], ...]) -> Tuple[Any, ...]:
+    """Values of an 'attr' source's attributes in spec order, _MISSING for absent ones"""
+    getter = _ATTR_SOURCE_GETTERS.get(spec)
+    if getter is not None:
+        try:
+            return getter(obj)
+        except AttributeError:
+            # attrgetter stops at the first missing attribute, read the rest one by one
+            pass
+    return tuple(_widget_attr(obj, obj_dict, attr) for _, attr in spec)
+
+def _normalize_options(options: Any) -> Optional[List[Dict[str, Any]]]:
+    """Widget options as [{'value': ..., 'label': ...}]; None if options isn't a list, tuple or dict"""
+    if isinstance(options, dict):
+        # Handle dictionary format: {label: value, ...}
+        return [{'value': value, 'label': label} for label, value in options.items()]
+    if isinstance(options, (list, tuple)):
+        return [opt if isinstance(opt, dict) else {'value': opt, 'label': str(opt)} for opt in options]
+    return None
+
+# Per-class results of the widget probes, they only depend on type(obj).
+# Weak keys: a class defined in a cell holds its session's globals through its methods,
+# a strong entry would keep ended sessions alive
+_widget_type_by_class: 'weakref.WeakKeyDictionary[type, Optional[str]]' = weakref.WeakKeyDictionary()
+_marimo_widget_class: 'weakref.WeakKeyDictionary[type, bool]' = weakref.WeakKeyDictionary()
+# Expression result formatters applicable to each class, see _result_formatters_for
+_result_formatters_by_class: 'weakref.WeakKeyDictionary[type, Tuple[Callable, ...]]' = weakref.WeakKeyDictionary()
+
+class _LazyCapture:
+    """
+    Stand-in for sys.stdout/sys.stderr that only allocates a StringIO on first write.
+
+    Most cells print nothing, so their capture never costs a buffer.
+    """
+    __slots__ = ('_buf',)
+
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self._buf = None
+
+    def write(self, s: str) -> int:
+        if self._buf is None:
+            self._buf = io.StringIO()
+        return self._buf.write(s)
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def getvalue(self) -> str:
+        return '' if self._buf is None else self._buf.getvalue()
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+    def writable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        raise io.UnsupportedOperation('fileno')
+
+@lru_cache(maxsize=256)
+def _compile_cell(code: str) -> Tuple[Optional[CodeType], Optional[CodeType]]:
+    """
+    Compile cell source into (statements, last expression) code objects.
+
+    Either part is None when absent. Cached so re-running an unchanged cell
+    skips parsing and compilation. The source is parsed once; both parts are
+    compiled from that tree, without inheriting this module's future flags.
+    """
+    optimize = Config.CELL_OPTIMIZE_LEVEL
+    parsed = compile(code, '<cell>', 'exec', flags=ast.PyCF_ONLY_AST, dont_inherit=True, optimize=optimize)
+
+    expression = None
+    if parsed.body and isinstance(parsed.body[-1], ast.Expr):
+        # The last statement is an expression, evaluate it separately to get its value
+        last_node = parsed.body.pop()
+        expression = compile(ast.Expression(body=last_node.value), '<cell>', 'eval', dont_inherit=True, optimize=optimize)
+
+    statements = compile(parsed, '<cell>', 'exec', dont_inherit=True, optimize=optimize) if parsed.body else None
+    return statements, expression
+
+@lru_cache(maxsize=512)
+def _cell_referenced_names(code: str) -> FrozenSet[str]:
+    """
+    Names a cell's bytecode looks up, read from the code objects it already runs.
+
+    co_names of the cell and every nested function, class or comprehension body.
+    This over-approximates (attribute names are in co_names too), which only ever
+    keeps a variable alive during cleanup, never drops one that's used.
+    """
+    names = set()
+    pending = [part for part in _compile_cell(code.strip()) if part is not None]
+    while pending:
+        code_obj = pending.pop()
+        names.update(code_obj.co_names)
+        pending.extend(const for const in code_obj.co_consts if isinstance(const, CodeType))
+    return frozenset(names)
+
+@lru_cache(maxsize=512)
+def _cell_bound_name_candidates(code: str) -> Optional[FrozenSet[str]]:
+    """
+    Names a cell run may bind or delete in the session globals; None if it could be any name.
+
+    Every STORE/DELETE of a global, including through `global` in a nested function,
+    names it in co_names, so _cell_referenced_names covers them. A star import binds
+    names that aren't in the code at all.
+    """
+    try:
+        tree = parse_code(code)
+        names = _cell_referenced_names(code)
+    except (SyntaxError, ValueError):
+        # Won't run, so it binds nothing
+        return frozenset()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names):
+            return None
+    return names
+
+# linecache holds one '<cell>' source at a time, so registering it and formatting happen under this lock
+_cell_linecache_lock = threading.Lock()
+
+def _format_cell_traceback(exc: BaseException, code: str) -> str:
+    """
+    Format exc's traceback, dropping frames of this module.
+
+    The cell source is registered in linecache so '<cell>' frames show their lines.
+    """
+    tbe = traceback.TracebackException.from_exception(exc, lookup_lines=False)
+    tbe.stack = traceback.StackSummary.from_list([frame for frame in tbe.stack if frame.filename != __file__])
+
+    # Cells are compiled stripped, see _execute_with_expression_handling
+    source = code.strip()
+    with _cell_linecache_lock:
+        linecache.cache['<cell>'] = (len(source), None, source.splitlines(keepends=True), '<cell>')
+        return ''.join(tbe.format())
+
+# Figure PNGs are rendered into one pooled buffer per thread; a buffer grown past this is not kept
+IMG_BUFFER_MAX_BYTES = 8 << 20
+_tls = threading.local()
+
+def _get_img_buffer() -> io.BytesIO:
+    """This thread's figure buffer, emptied for reuse"""
+    buf = getattr(_tls, 'img_buffer', None)
+    if buf is None:
+        buf = io.BytesIO()
+        _tls.img_buffer = buf
+    else:
+        buf.seek(0)
+        buf.truncate(0)
+    return buf
+
+# Cells starting with this line opt into result caching: they are skipped while their code and inputs are unchanged.
+# Inputs are compared by repr(), so in-place changes a repr doesn't show are not seen: objects with the
+# default object.__repr__, or numpy/pandas values mutated inside the part their truncated repr leaves out.
+# Such a cell replays its previous result; don't mark cells that read objects like that.
+CELL_CACHE_MARKER = '# %%cache'
+
+@lru_cache(maxsize=256)
+def _cell_input_names(code: str) -> Optional[Tuple[str, ...]]:
+    """
+    Names a cell reads from other cells, sorted; None if the code doesn't parse.
+
+    Names the cell assigns itself are left out: they exist after its first run,
+    so including them would change the key and the cell would never hit.
+    """
+    try:
+        tree = parse_code(code)
+        _, assigned_names = _analyze_code(code)
+    except (SyntaxError, ValueError):
+        return None
+    read_names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    return tuple(sorted(read_names - assigned_names))
+
+def _record_outputs(stream: Generator, sink: List[Dict[str, Any]]) -> Generator:
+    """Re-yield a cell output stream, appending each output to sink, and return its result"""
+    with closing(stream):
+        while True:
+            try:
+                output = next(stream)
+            except StopIteration as done:
+                return done.value
+            sink.append(output)
+            yield output
+
+# Any widget call needs one of these in its source (mo.ui.*, ui.*, or a bare widget function)
+WIDGET_SOURCE_HINTS = ('ui',) + MARIMO_WIDGET_CLASS_HINTS
+
+@lru_cache(maxsize=256)
+def _compile_widget_calls(code: str) -> Tuple[CodeType, ...]:
+    """
+    Compiled standalone widget-creating calls found in a cell, in source order.
+
+    Cached so re-running a cell doesn't walk its AST again; cells that can't
+    contain a widget call are rejected by a substring check without parsing.
+    """
+    if not any(hint in code for hint in WIDGET_SOURCE_HINTS):
+        return ()
+
+    try:
+        tree = parse_code(code)
+    except (SyntaxError, ValueError):
+        return ()
+
+    detector = WidgetDetectorVisitor(None)
+    detector.visit(tree)
+
+    # Only show widgets from standalone expressions or function calls,
+    # NOT from simple assignments (which would create duplicates)
+    calls = []
+    # A standalone call is reported by both visit_Expr and visit_Call; constructing it twice
+    # would cost a second widget construction and emit the same widget twice
+    seen_nodes = set()
+    for call_info in detector.widget_calls:
+        if call_info.get('is_assignment') or id(call_info['node']) in seen_nodes:
+            continue
+        seen_nodes.add(id(call_info['node']))
+        try:
+            calls.append(compile(call_info['code'], '<widget>', 'eval'))
+        except (SyntaxError, ValueError):
+            pass
+    return tuple(calls)
+
 class MarimoCellExecutor:
     def __init__(self, session: 'NotebookSession'):
         self.session = session
         self.security_validator = SecurityValidator()
         self.logger = get_logger("executor")
+        # id(widget) -> (widget, type) for widgets seen by this executor; holding the widget keeps its id unique
+        self._widget_type_cache: Dict[int, Tuple[Any, str]] = {}
 
     def execute_cell(self, cell_id: str, code: str) -> Tuple[bool, List[Dict[str, Any]], str, Dict[str, Any]]:
         """Executes a cell and captures its output and errors."""
+        outputs = []
+        console_outputs = []
+        stream = self.execute_cell_stream(cell_id, code)
+        while True:
+            try:
+                output = next(stream)
+            except StopIteration as done:
+                success, error, cell_state = done.value
+                break
+            if output['type'] in CONSOLE_OUTPUT_TYPES:
+                console_outputs.append(output)
+            else:
+                outputs.append(output)
+
+        # Console output is reported ahead of the cell's other outputs, joined once at the end
+        console_outputs.extend(outputs)
+        return success, console_outputs, error, cell_state
+
+    def execute_cell_stream(self, cell_id: str, code: str) -> Generator[Dict[str, Any], None, Tuple[bool, str, Dict[str, Any]]]:
+        """
+        Executes a cell, yielding each output once the cell has finished running.
+
+        Outputs are buffered while stdout/stderr and cwd are redirected, then yielded
+        in order; captured stdout/stderr come last.
+        The generator returns (success, error, cell_state) when exhausted.
+
+        Cells starting with CELL_CACHE_MARKER replay their last successful run
+        instead of executing when their code and the values they read are unchanged.
+        """
         
         self.logger.debug(f"Starting execution for cell '{cell_id}'")
         
         is_valid, validation_error = self.security_validator.validate_code(code)
         if not is_valid:
             self.logger.warning(f"Security validation failed for cell '{cell_id}': {validation_error}")
-            error_output = self._format_error(validation_error)
-            return False, [error_output], str(validation_error), {}
+            yield self._format_error(validation_error)
+            return False, str(validation_error), {}
+
+        cache_key = self._cell_cache_key(code) if code.lstrip().startswith(CELL_CACHE_MARKER) else None
+        if cache_key is None:
+            return (yield from self._run_cell_stream(cell_id, code))
+
+        cached = self.session.restore_cached_cell_result(cell_id, cache_key)
+        if cached is not None:
+            self.logger.debug(f"Cell '{cell_id}' unchanged, replaying cached result")
+            outputs, cell_state = cached
+            yield from outputs
+            return True, "", cell_state
+
+        outputs = []
+        success, error, cell_state = yield from _record_outputs(self._run_cell_stream(cell_id, code), outputs)
+        # Widgets are registered per run, replaying their outputs would point at stale state
+        if success and not self.session.get_cell_widgets(cell_id):
+            self.session.cache_cell_result(cell_id, cache_key, outputs, cell_state)
+        return success, error, cell_state
+
+    def _cell_cache_key(self, code: str) -> Optional[Tuple[bytes, bytes]]:
+        """(code hash, inputs hash) identifying a cell run, or None if it can't be cached"""
+        input_names = _cell_input_names(code)
+        if input_names is None:
+            return None
+
+        globals_ = self.session.globals
+        inputs_hash = hashlib.blake2b()
+        for name in input_names:
+            if name in globals_:
+                inputs_hash.update(name.encode())
+                inputs_hash.update(b'\x00')
+                inputs_hash.update(repr(globals_[name]).encode())
+                inputs_hash.update(b'\x00')
+
+        return hashlib.blake2b(code.encode()).digest(), inputs_hash.digest()
+
+    def _run_cell_stream(self, cell_id: str, code: str) -> Generator[Dict[str, Any], None, Tuple[bool, str, Dict[str, Any]]]:
+        """Run validated cell code, see execute_cell_stream"""
 
         # Clean up variables and track state
         cleanup_error = None
-        pre_execution_state = None
         
         try:
             # Clean up variables from previous execution of this cell
@@ -49,266 +435,179 @@ class MarimoCellExecutor:
             self.logger.debug(f"Cleaning up conflicting initial imports for cell '{cell_id}'")
             self.session._cleanup_conflicting_initial_imports(cell_id, code)
             
-            # Capture pre-execution state for tracking
-            pre_execution_state = self.session._capture_pre_execution_state(cell_id)
-            
         except Exception as cleanup_ex:
             # If cleanup fails, log but continue with execution
             cleanup_error = f"Cleanup failed: {str(cleanup_ex)}"
             self.logger.warning(f"Variable cleanup warning for cell '{cell_id}': {cleanup_error}")
-            # Still capture pre-state even if cleanup failed
-            try:
-                pre_execution_state = self.session._capture_pre_execution_state(cell_id)
-            except Exception:
-                pre_execution_state = {}
 
-        # Store current working directory to restore later
-        original_cwd = os.getcwd()
-        
-        # Change to session's working directory if it exists
-        if self.session.working_dir and os.path.exists(self.session.working_dir):
-            os.chdir(self.session.working_dir)
+        # Capture the names the cell may assign from here on, cleanup above doesn't count
+        self.session._begin_variable_tracking(_cell_bound_name_candidates(code))
 
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-        redirected_stdout = io.StringIO()
-        redirected_stderr = io.StringIO()
-        sys.stdout = redirected_stdout
-        sys.stderr = redirected_stderr
+        redirected_stdout = _LazyCapture()
+        redirected_stderr = _LazyCapture()
 
-        outputs = []
         error = ""
         success = False
         processed_widgets = set()  # Track already processed widgets to prevent duplicates
 
-        try:
-            # Parse the code to identify if last statement is an expression
-            code_result = self._execute_with_expression_handling(code)
+        # stdout/stderr and cwd are process-wide: outputs produced while they are swapped are
+        # buffered and only yielded after the with block restores them, so a slow or overlapping
+        # stream never holds the redirect open while waiting on its client
+        outputs = []
+        with ExitStack() as stack:
+            stack.enter_context(redirect_stdout(redirected_stdout))
+            stack.enter_context(redirect_stderr(redirected_stderr))
+
+            # Change to session's working directory if it exists; the original cwd is only read then
+            if self.session.working_dir and os.path.exists(self.session.working_dir):
+                stack.enter_context(chdir(self.session.working_dir))
+
+            try:
+                # Parse the code to identify if last statement is an expression
+                code_result = self._execute_with_expression_handling(code)
             
-            # Check if the expression result is a matplotlib figure
-            is_matplotlib_figure = False
-            if code_result is not None and hasattr(code_result, 'savefig'):
-                is_matplotlib_figure = True
+                # Check if the expression result is a matplotlib figure
+                is_matplotlib_figure = False
+                if code_result is not None and hasattr(code_result, 'savefig'):
+                    is_matplotlib_figure = True
             
-            # Check if the last expression result is a widget
-            last_expression_is_widget = False
-            if code_result is not None and self._is_marimo_widget(code_result):
-                last_expression_is_widget = True
+                # Check if the last expression result is a widget
+                last_expression_is_widget = False
+                if code_result is not None and self._is_marimo_widget(code_result):
+                    last_expression_is_widget = True
             
-            # If we have a result from the last expression, format it
-            if code_result is not None:
-                expression_output = self._format_expression_result(code_result, processed_widgets)
-                outputs.append(expression_output)
+                # If we have a result from the last expression, format it
+                if code_result is not None:
+                    outputs.append(self._format_expression_result(code_result, processed_widgets))
             
-            # AST widget detection - only for widgets not covered by expression result
-            # Skip AST detection if the last expression was already a widget
-            if not last_expression_is_widget:
-                widget_results = self._detect_widgets_in_code(code, processed_widgets)
-                for widget_result in widget_results:
-                    outputs.append(widget_result)
+                # AST widget detection - only for widgets not covered by expression result
+                # Skip AST detection if the last expression was already a widget
+                if not last_expression_is_widget:
+                    outputs.extend(self._detect_widgets_in_code(code, processed_widgets))
             
-            # Check for matplotlib figures that might have been created but not returned
-            # Only capture if we didn't already capture a matplotlib figure as expression result
-            if not is_matplotlib_figure:
-                matplotlib_figures = self._capture_matplotlib_figures()
-                for fig_output in matplotlib_figures:
-                    outputs.append(fig_output)
+                # Check for matplotlib figures that might have been created but not returned
+                # Only capture if we didn't already capture a matplotlib figure as expression result
+                if not is_matplotlib_figure:
+                    outputs.extend(self._capture_matplotlib_figures())
             
-            # Track variables after successful execution
-            try:
-                self.logger.debug(f"Tracking variables for cell '{cell_id}' after successful execution")
-                self.session._track_cell_variables(cell_id, pre_execution_state or {})
-            except Exception as tracking_ex:
-                # If tracking fails, log but don't fail the execution
-                tracking_error = f"Variable tracking failed: {str(tracking_ex)}"
-                self.logger.warning(f"Variable tracking warning for cell '{cell_id}': {tracking_error}")
-                # Add warning to outputs but don't mark execution as failed
-                outputs.append({
-                    "type": "WARNING", 
-                    "content": f"Variable tracking warning: {tracking_error}", 
-                    "mime_type": "text/plain"
-                })
+                # Warnings from tracking are reported but don't fail the execution
+                outputs.extend(self._track_cell(cell_id, code, failed=False))
             
-            # Track imports after successful execution
-            try:
-                self.logger.debug(f"Tracking imports for cell '{cell_id}' after successful execution")
-                self.session._track_cell_imports(cell_id, code)
-            except Exception as import_tracking_ex:
-                # If import tracking fails, log but don't fail the execution
-                import_tracking_error = f"Import tracking failed: {str(import_tracking_ex)}"
-                self.logger.warning(f"Import tracking warning for cell '{cell_id}': {import_tracking_error}")
-                # Add warning to outputs but don't mark execution as failed
-                outputs.append({
-                    "type": "WARNING", 
-                    "content": f"Import tracking warning: {import_tracking_error}", 
-                    "mime_type": "text/plain"
-                })
+                success = True
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self.logger.error(f"Cell execution failed for '{cell_id}': {error}")
+                # Traceback of the user's code, without this executor's frames
+                outputs.append(self._format_error(_format_cell_traceback(e, code)))
             
-            # Track widgets after successful execution
+                # Track even after failed execution (for partial state); warnings aren't added
+                # to outputs since we already have an execution error
+                self._track_cell(cell_id, code, failed=True)
+
+        yield from outputs
+
+        # Handle stderr output
+        stderr_val = redirected_stderr.getvalue()
+        if stderr_val and not error:
+            # If there's something in stderr but no exception was caught, treat it as a warning/text output
+            yield {"type": "STDERR", "content": stderr_val, "mime_type": "text/plain"}
+        elif stderr_val and error:
+            # If an exception was caught, the traceback is already in outputs.
+            # We can log the raw stderr_val if needed for debugging.
+            self.logger.warning(f"Stderr from failed execution: {stderr_val}")
+
+        # Handle stdout output (from print statements)
+        stdout_val = redirected_stdout.getvalue()
+        if stdout_val:
+            yield {"type": "STDOUT", "content": stdout_val, "mime_type": "text/plain"}
+
+        # Only report what this cell defined or reassigned; GetSessionState has the full picture
+        cell_state = self._get_cell_state(self.session.get_cell_variables(cell_id))
+        return success, error, cell_state
+
+    def _track_cell(self, cell_id: str, code: str, failed: bool) -> List[Dict[str, Any]]:
+        """
+        Run the session's variable, import, reference and widget tracking for a cell.
+
+        The steps run in order because reference and widget tracking read the
+        variables just tracked. A failing step is logged and skipped; returns a WARNING output
+        for each failure.
+        """
+        steps = (
+            ('Variable', 'variables', lambda: self.session._track_cell_variables(cell_id)),
+            ('Import', 'imports', lambda: self.session._track_cell_imports(cell_id, code)),
+            ('Reference', 'references', lambda: self.session._track_cell_references(cell_id, _cell_referenced_names(code))),
+            ('Widget', 'widgets', lambda: self.session._track_cell_widgets(cell_id)),
+        )
+        phase = "failed execution (partial state)" if failed else "successful execution"
+        suffix = " after execution error" if failed else ""
+
+        warnings = []
+        for label, tracked, track in steps:
             try:
-                self.logger.debug(f"Tracking widgets for cell '{cell_id}' after successful execution")
-                self.session._track_cell_widgets(cell_id)
-            except Exception as widget_tracking_ex:
-                # If widget tracking fails, log but don't fail the execution
-                widget_tracking_error = f"Widget tracking failed: {str(widget_tracking_ex)}"
-                self.logger.warning(f"Widget tracking warning for cell '{cell_id}': {widget_tracking_error}")
-                # Add warning to outputs but don't mark execution as failed
-                outputs.append({
+                self.logger.debug(f"Tracking {tracked} for cell '{cell_id}' after {phase}")
+                track()
+            except Exception as tracking_ex:
+                tracking_error = f"{label} tracking failed{suffix}: {str(tracking_ex)}"
+                self.logger.warning(f"{label} tracking warning for cell '{cell_id}': {tracking_error}")
+                warnings.append({
                     "type": "WARNING", 
-                    "content": f"Widget tracking warning: {widget_tracking_error}", 
+                    "content": f"{label} tracking warning: {tracking_error}", 
                     "mime_type": "text/plain"
                 })
-            
-            success = True
-        except Exception as e:
-            error = f"{type(e).__name__}: {e}"
-            self.logger.error(f"Cell execution failed for '{cell_id}': {error}")
-            # Capture full traceback for detailed error logging
-            tb = traceback.format_exc()
-            outputs.append(self._format_error(tb))
-            
-            # Track variables even after failed execution (for partial state)
-            try:
-                self.logger.debug(f"Tracking variables for cell '{cell_id}' after failed execution (partial state)")
-                # Use empty pre-state if tracking failed during setup
-                self.session._track_cell_variables(cell_id, pre_execution_state or {})
-            except Exception as tracking_ex:
-                tracking_error = f"Variable tracking failed after execution error: {str(tracking_ex)}"
-                self.logger.warning(f"Variable tracking warning for cell '{cell_id}': {tracking_error}")
-                # Don't add to outputs since we already have an execution error
-            
-            # Track imports even after failed execution (for partial state)
-            try:
-                self.logger.debug(f"Tracking imports for cell '{cell_id}' after failed execution (partial state)")
-                self.session._track_cell_imports(cell_id, code)
-            except Exception as import_tracking_ex:
-                import_tracking_error = f"Import tracking failed after execution error: {str(import_tracking_ex)}"
-                self.logger.warning(f"Import tracking warning for cell '{cell_id}': {import_tracking_error}")
-                # Don't add to outputs since we already have an execution error
-            
-            # Track widgets even after failed execution (for partial state)
-            try:
-                self.logger.debug(f"Tracking widgets for cell '{cell_id}' after failed execution (partial state)")
-                self.session._track_cell_widgets(cell_id)
-            except Exception as widget_tracking_ex:
-                widget_tracking_error = f"Widget tracking failed after execution error: {str(widget_tracking_ex)}"
-                self.logger.warning(f"Widget tracking warning for cell '{cell_id}': {widget_tracking_error}")
-                # Don't add to outputs since we already have an execution error
-        finally:
-            # Restore original working directory
-            os.chdir(original_cwd)
-            
-            sys.stdout = old_stdout
-            sys.stderr = old_stderr
-
-            # Handle stdout output (from print statements)
-            stdout_val = redirected_stdout.getvalue()
-            if stdout_val:
-                outputs.insert(0, {"type": "STDOUT", "content": stdout_val, "mime_type": "text/plain"})
-
-            # Handle stderr output
-            stderr_val = redirected_stderr.getvalue()
-            if stderr_val and not error:
-                # If there's something in stderr but no exception was caught, treat it as a warning/text output
-                outputs.insert(0, {"type": "STDERR", "content": stderr_val, "mime_type": "text/plain"})
-            elif stderr_val and error:
-                 # If an exception was caught, the traceback is already in outputs.
-                 # We can log the raw stderr_val if needed for debugging.
-                 self.logger.warning(f"Stderr from failed execution: {stderr_val}")
-
-        cell_state = self._get_cell_state()
-        return success, outputs, error, cell_state
+        return warnings
 
     def _execute_with_expression_handling(self, code: str) -> Any:
         """Execute code with special handling for last expression."""
         code = code.strip()
         if not code:
             return None
-            
-        try:
-            # Parse the code to analyze the structure
-            parsed = ast.parse(code)
-            
-            if not parsed.body:
-                return None
-            
-            # Check if the last statement is an expression
-            last_node = parsed.body[-1]
-            
-            if isinstance(last_node, ast.Expr):
-                # The last statement is an expression
-                # Split the code into statements and the last expression
-                lines = code.split('\n')
-                
-                # Find the start line of the last expression
-                last_expr_start = last_node.lineno - 1
-                last_expr_end = last_node.end_lineno if hasattr(last_node, 'end_lineno') else len(lines)
-                
-                # Extract statements before the last expression
-                statements_lines = lines[:last_expr_start]
-                expression_lines = lines[last_expr_start:last_expr_end]
-                
-                statements_code = '\n'.join(statements_lines).strip()
-                expression_code = '\n'.join(expression_lines).strip()
-                
-                # Execute the statements first
-                if statements_code:
-                    exec(statements_code, self.session.globals)
-                
-                # Evaluate the last expression and return its result
-                if expression_code:
-                    result = eval(expression_code, self.session.globals)
-                    return result
-                    
-            else:
-                # No expression at the end, just execute normally
-                exec(code, self.session.globals)
-                return None
-                
-        except SyntaxError:
-            # If parsing fails, fall back to regular execution
-            exec(code, self.session.globals)
-            return None
-            
+
+        statements, expression = _compile_cell(code)
+
+        # Execute the statements first
+        if statements is not None:
+            exec(statements, self.session.globals)
+
+        # Evaluate the last expression and return its result
+        if expression is not None:
+            return eval(expression, self.session.globals)
+
         return None
 
     def _capture_matplotlib_figures(self) -> List[Dict[str, Any]]:
         """Capture any matplotlib figures that were created but not returned."""
         figures = []
         
+        # Figures can only exist if the user's code imported pyplot; don't import it just to look
+        plt = sys.modules.get('matplotlib.pyplot')
+        if plt is None:
+            return figures
+        
         try:
-            # Try to import matplotlib
-            import matplotlib.pyplot as plt
+            # Walk the figure managers directly instead of re-activating each figure via plt.figure(num)
+            gcf = sys.modules['matplotlib._pylab_helpers'].Gcf
+            # Most cells don't plot: an empty figure registry is one dict check
+            if not gcf.figs:
+                return figures
             
-            # Get all current figures
-            fig_nums = plt.get_fignums()
+            managers = sorted(gcf.get_all_fig_managers(), key=lambda manager: manager.num)
             
-            for fig_num in fig_nums:
-                fig = plt.figure(fig_num)
+            for manager in managers:
+                fig = manager.canvas.figure
                 
-                # Check if the figure has any content (axes with data)
-                if fig.get_axes():
-                    # Check if any axes have data plotted
-                    has_data = False
-                    for ax in fig.get_axes():
-                        if ax.lines or ax.patches or ax.collections or ax.images:
-                            has_data = True
-                            break
-                    
-                    if has_data:
-                        # Format the figure
-                        fig_output = self._format_matplotlib_figure(fig)
-                        if fig_output:
-                            figures.append(fig_output)
+                # Check if any axes have data plotted
+                if any(ax.lines or ax.patches or ax.collections or ax.images for ax in fig.get_axes()):
+                    # Format the figure
+                    fig_output = self._format_matplotlib_figure(fig)
+                    if fig_output:
+                        figures.append(fig_output)
                 
                 # Close the figure to prevent memory leaks
                 plt.close(fig)
                 
-        except ImportError:
-            # Matplotlib not available
-            pass
         except Exception:
-            # Any other error in matplotlib handling
+            # Any error in matplotlib handling
             pass
             
         return figures
@@ -326,170 +625,160 @@ class MarimoCellExecutor:
                 'data_type': 'TEXT'
             }
         
-        # Check if result is a marimo widget
-        if self._is_marimo_widget(result):
-            # Create a unique identifier for this widget object
-            widget_object_id = id(result)
-            if widget_object_id in processed_widgets:
-                # Widget already processed, return a simple representation instead
-                return {
-                    'type': 'EXPRESSION_RESULT',
-                    'content': f'<marimo widget: {self._get_widget_type(result)}>',
-                    'mime_type': 'text/plain',
-                    'data_type': 'TEXT'
-                }
-            
-            # Mark this widget as processed
-            processed_widgets.add(widget_object_id)
-            return self._format_widget_result(result)
-            
-        # Handle pandas DataFrames
-        if hasattr(result, '_repr_html_'):
+        # Try the formatters that apply to this type, probed once per class
+        formatters = _result_formatters_by_class.get(type(result))
+        if formatters is None:
+            formatters = self._result_formatters_for(result)
+            _result_formatters_by_class[type(result)] = formatters
+
+        for formatter in formatters:
             try:
-                html_repr = result._repr_html_()
-                return {
-                    'type': 'EXPRESSION_RESULT',
-                    'content': html_repr,
-                    'mime_type': 'text/html',
-                    'data_type': 'HTML'
-                }
+                formatted = formatter(self, result, processed_widgets)
             except Exception:
-                pass
+                formatted = None
+            if formatted:
+                return formatted
         
-        # Handle pandas DataFrames with fallback
+        # Default case: use repr() for string representation
         try:
-            import pandas as pd
-            if isinstance(result, pd.DataFrame):
-                try:
-                    # Try HTML representation first
-                    html_repr = result._repr_html_()
-                    return {
-                        'type': 'EXPRESSION_RESULT',
-                        'content': html_repr,
-                        'mime_type': 'text/html',
-                        'data_type': 'HTML'
-                    }
-                except Exception:
-                    # Fallback to string representation
-                    return {
-                        'type': 'EXPRESSION_RESULT',
-                        'content': str(result),
-                        'mime_type': 'text/plain',
-                        'data_type': 'TEXT'
-                    }
-            elif isinstance(result, pd.Series):
-                try:
-                    # Handle pandas Series
-                    return {
-                        'type': 'EXPRESSION_RESULT',
-                        'content': str(result),
-                        'mime_type': 'text/plain',
-                        'data_type': 'TEXT'
-                    }
-                except Exception:
-                    pass
-        except ImportError:
-            # Pandas not available, continue with other handlers
-            pass
+            repr_str = repr(result)
+            return {
+                'type': 'EXPRESSION_RESULT',
+                'content': repr_str,
+                'mime_type': 'text/plain',
+                'data_type': 'TEXT'
+            }
         except Exception:
-            # Any other pandas-related error
-            pass
+            return {
+                'type': 'EXPRESSION_RESULT',
+                'content': "Object not representable",
+                'mime_type': 'text/plain',
+                'data_type': 'TEXT'
+            }
+
+    def _result_formatters_for(self, result: Any) -> Tuple[Callable, ...]:
+        """Formatters applicable to result's type, in the order they are tried"""
+        formatters = []
+
+        # Check if result is a marimo widget
+        if self._is_marimo_widget(result):
+            formatters.append(MarimoCellExecutor._format_widget_expression)
+            
+        # Handle objects with an HTML representation (pandas DataFrames among them)
+        if hasattr(result, '_repr_html_'):
+            formatters.append(MarimoCellExecutor._format_html_expression)
+        
+        # Handle pandas objects with fallback; a DataFrame implies pandas is already imported
+        pd = sys.modules.get('pandas')
+        if pd is not None and isinstance(result, (pd.DataFrame, pd.Series)):
+            formatters.append(MarimoCellExecutor._format_text_expression)
         
         # Handle matplotlib/plotly figures
         if hasattr(result, 'savefig'):
-            try:
-                figure_output = self._format_matplotlib_figure(result)
-                if figure_output:
-                    return figure_output
-            except Exception:
-                pass
+            formatters.append(MarimoCellExecutor._format_figure_expression)
         
         # Handle lists, dicts, and other structured data
         if isinstance(result, (list, dict, tuple, set)):
-            try:
-                # For structured data, provide a nice representation
-                import json
-                if isinstance(result, (list, dict)):
-                    # Try to serialize as JSON for better formatting
-                    json_str = json.dumps(result, indent=2, default=str)
-                    return {
-                        'type': 'EXPRESSION_RESULT',
-                        'content': json_str,
-                        'mime_type': 'application/json',
-                        'data_type': 'JSON'
-                    }
-                else:
-                    # For tuples, sets, etc., use repr
-                    return {
-                        'type': 'EXPRESSION_RESULT',
-                        'content': repr(result),
-                        'mime_type': 'text/plain',
-                        'data_type': 'TEXT'
-                    }
-            except Exception:
-                pass
+            formatters.append(MarimoCellExecutor._format_structured_expression)
         
         # Handle numpy arrays
         if hasattr(result, 'shape') and hasattr(result, 'dtype'):
-            try:
-                # This is likely a numpy array
-                shape = getattr(result, 'shape')
-                dtype = getattr(result, 'dtype')
-                
-                # For small arrays, show the full content
-                if hasattr(result, 'size') and result.size <= 100:
-                    array_info = f"Array shape: {shape}, dtype: {dtype}\n{repr(result)}"
-                else:
-                    # For large arrays, show summary
-                    array_info = f"Array shape: {shape}, dtype: {dtype}\n{str(result)}"
-                
-                return {
-                    'type': 'EXPRESSION_RESULT',
-                    'content': array_info,
-                    'mime_type': 'text/plain',
-                    'data_type': 'TEXT'
-                }
-            except Exception:
-                pass
-        
-        # Default case: use repr() for string representation
-        try:
-            repr_str = repr(result)
+            formatters.append(MarimoCellExecutor._format_array_expression)
+
+        return tuple(formatters)
+
+    def _format_widget_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        # Create a unique identifier for this widget object
+        widget_object_id = id(result)
+        if widget_object_id in processed_widgets:
+            # Widget already processed, return a simple representation instead
             return {
                 'type': 'EXPRESSION_RESULT',
-                'content': repr_str,
+                'content': f'<marimo widget: {self._get_widget_type(result)}>',
                 'mime_type': 'text/plain',
                 'data_type': 'TEXT'
             }
-        except Exception:
+        
+        # Mark this widget as processed
+        processed_widgets.add(widget_object_id)
+        return self._format_widget_result(result)
+
+    def _format_html_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        return {
+            'type': 'EXPRESSION_RESULT',
+            'content': result._repr_html_(),
+            'mime_type': 'text/html',
+            'data_type': 'HTML'
+        }
+
+    def _format_text_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        return {
+            'type': 'EXPRESSION_RESULT',
+            'content': str(result),
+            'mime_type': 'text/plain',
+            'data_type': 'TEXT'
+        }
+
+    def _format_figure_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        return self._format_matplotlib_figure(result)
+
+    def _format_structured_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        # For structured data, provide a nice representation
+        if isinstance(result, (list, dict)):
+            # Try to serialize as JSON for better formatting
             return {
                 'type': 'EXPRESSION_RESULT',
-                'content': "Object not representable",
-                'mime_type': 'text/plain',
-                'data_type': 'TEXT'
+                'content': json.dumps(result, indent=2, default=str),
+                'mime_type': 'application/json',
+                'data_type': 'JSON'
             }
+        # For tuples, sets, etc., use repr
+        return {
+            'type': 'EXPRESSION_RESULT',
+            'content': repr(result),
+            'mime_type': 'text/plain',
+            'data_type': 'TEXT'
+        }
+
+    def _format_array_expression(self, result: Any, processed_widgets: Set) -> Dict[str, Any]:
+        # This is likely a numpy array
+        shape = result.shape
+        dtype = result.dtype
+        
+        # For small arrays, show the full content
+        if hasattr(result, 'size') and result.size <= 100:
+            array_info = f"Array shape: {shape}, dtype: {dtype}\n{repr(result)}"
+        else:
+            # For large arrays, show summary
+            array_info = f"Array shape: {shape}, dtype: {dtype}\n{str(result)}"
+        
+        return {
+            'type': 'EXPRESSION_RESULT',
+            'content': array_info,
+            'mime_type': 'text/plain',
+            'data_type': 'TEXT'
+        }
 
     def _format_matplotlib_figure(self, figure) -> Dict[str, Any]:
-        """Format a matplotlib figure as base64 encoded PNG."""
+        """
+        Format a matplotlib figure as raw PNG bytes in the output's data field.
+
+        The bytes travel as-is over gRPC; the data: URL is assembled by the frontend.
+        """
         try:
-            # Try to import matplotlib
-            import matplotlib.pyplot as plt
-            from io import BytesIO
-            
-            # Save figure to bytes
-            img_buffer = BytesIO()
+            # Save figure to this thread's pooled buffer
+            img_buffer = _get_img_buffer()
             figure.savefig(img_buffer, format='png', bbox_inches='tight', dpi=100)
-            img_buffer.seek(0)
-            
-            # Encode as base64
-            img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
+            png_bytes = img_buffer.getvalue()
             
-            # Close the buffer
-            img_buffer.close()
+            # Don't hold on to the memory of an unusually large figure
+            if len(png_bytes) > IMG_BUFFER_MAX_BYTES:
+                del _tls.img_buffer
             
             return {
                 'type': 'EXPRESSION_RESULT',
-                'content': f"data:image/png;base64,{img_base64}",
+                'content': '',
+                'data': png_bytes,
                 'mime_type': 'image/png',
                 'data_type': 'IMAGE'
             }
@@ -510,19 +799,37 @@ class MarimoCellExecutor:
                 'data_type': 'TEXT'
             }
 
-    def _get_cell_state(self) -> Dict[str, str]:
-        """Gets a string representation of the current state of variables."""
+    def _get_cell_state(self, names: Set[str]) -> Dict[str, str]:
+        """Gets a string representation of the given variables."""
         state = {}
         # Add marimo to the globals if not already present for context
         self.session.globals['mo'] = mo
-        for name, value in self.session.globals.items():
-            if not name.startswith('_') and name not in ['In', 'Out', 'exit', 'quit', 'get_ipython']:
-                try:
-                    state[name] = repr(value)
-                except Exception:
-                    state[name] = "Not Serializable"
+        session_globals = self.session.globals
+        for name in names:
+            if name[:1] == '_' or name in CELL_STATE_EXCLUDED_NAMES or name not in session_globals:
+                continue
+            value = session_globals[name]
+            if isinstance(value, CELL_STATE_SKIPPED_TYPES):
+                continue
+            try:
+                state[name] = self._summarize_value(value)
+            except Exception:
+                state[name] = "Not Serializable"
         return state
 
+    def _summarize_value(self, value: Any) -> str:
+        """Bounded repr of a value, short-circuited for arrays/DataFrames."""
+        # Only probe types from libraries the user already imported
+        np = sys.modules.get('numpy')
+        if np is not None and isinstance(value, np.ndarray):
+            return f"ndarray(shape={value.shape}, dtype={value.dtype})"
+        pd = sys.modules.get('pandas')
+        if pd is not None and isinstance(value, pd.DataFrame):
+            return f"DataFrame(shape={value.shape})"
+
+        # Containers are walked only up to the limits instead of repr'd whole and then cut
+        return CELL_STATE_REPR.repr(value)
+
     def _format_error(self, error_message: str) -> Dict[str, str]:
         """Formats an error message into the standard output structure."""
         return {
@@ -532,6 +839,15 @@ class MarimoCellExecutor:
         }
 
     def _is_marimo_widget(self, obj: Any) -> bool:
+        """Check if an object is a marimo widget, probed once per class"""
+        obj_class = type(obj)
+        is_widget = _marimo_widget_class.get(obj_class)
+        if is_widget is None:
+            is_widget = self._probe_marimo_widget(obj)
+            _marimo_widget_class[obj_class] = is_widget
+        return is_widget
+
+    def _probe_marimo_widget(self, obj: Any) -> bool:
         """Check if an object is a marimo widget"""
         if obj is None:
             return False
@@ -544,8 +860,8 @@ class MarimoCellExecutor:
         
         # Check for marimo widget class patterns
         class_name = str(type(obj))
-        if 'marimo' in class_name and any(widget_type in class_name.lower() for widget_type in 
-                                         ['slider', 'button', 'text', 'checkbox', 'dropdown', 'select', 'radio', 'multiselect', 'number']):
+        lowered = class_name.lower()
+        if 'marimo' in class_name and any(hint in lowered for hint in MARIMO_WIDGET_CLASS_HINTS):
             return True
         
         # Check if object has marimo widget methods/attributes
@@ -564,30 +880,13 @@ class MarimoCellExecutor:
         
         # Create a stable identifier for the widget based on its characteristics
         # instead of object identity which changes on each execution
-        widget_characteristics = {
-            'type': self._get_widget_type(result),
-            'properties': self._extract_widget_properties(result),
-            'value': self._get_widget_value(result)
-        }
-        
-        # Create a hash from the widget characteristics for stable identification
-        characteristics_str = json.dumps(widget_characteristics, sort_keys=True, default=str)
-        widget_hash = hashlib.md5(characteristics_str.encode()).hexdigest()[:8]
+        widget_type = self._get_widget_type(result)
+        properties = self._extract_widget_properties(result)
+        value = self._get_widget_value(result)
+        widget_hash = widget_characteristics_hash(widget_type, properties, value)
         
         # Check if a widget with similar characteristics already exists
-        existing_widget_id = None
-        for existing_id, widget_info in self.session.widgets.items():
-            existing_characteristics = {
-                'type': widget_info['type'],
-                'properties': widget_info['properties'],
-                'value': widget_info['value']
-            }
-            existing_str = json.dumps(existing_characteristics, sort_keys=True, default=str)
-            existing_hash = hashlib.md5(existing_str.encode()).hexdigest()[:8]
-            
-            if existing_hash == widget_hash:
-                existing_widget_id = existing_id
-                break
+        existing_widget_id = self.session.find_widget_by_hash(widget_hash)
         
         # If widget with same characteristics already exists, return existing widget data
         if existing_widget_id:
@@ -597,7 +896,7 @@ class MarimoCellExecutor:
             widget_data = {
                 'id': existing_widget_id,
                 'type': self.session.widgets[existing_widget_id]['type'],
-                'value': self._get_widget_value(result),
+                'value': value,
                 'properties': self.session.widgets[existing_widget_id]['properties']
             }
             
@@ -611,15 +910,6 @@ class MarimoCellExecutor:
         # Create new widget if not already registered
         widget_id = f"widget_{widget_hash}"  # Use hash for consistent ID
         
-        # Detect widget type and properties
-        widget_type = self._get_widget_type(result)
-        
-        # Extract widget properties
-        properties = self._extract_widget_properties(result)
-        
-        # Get current value with fallback
-        value = self._get_widget_value(result)
-        
         # Store widget in session registry
         self.session.add_widget(widget_id, result)
         
@@ -638,52 +928,40 @@ class MarimoCellExecutor:
         }
 
     def _get_widget_type(self, obj: Any) -> str:
-        """Detect widget type with fallbacks"""
-        # Check class name for type hints
-        class_name = str(type(obj)).lower()
+        """Widget type of obj, detected once per widget object"""
+        cached = self._widget_type_cache.get(id(obj))
+        if cached is not None and cached[0] is obj:
+            return cached[1]
         
-        # Direct class name mapping - check range_slider first before regular slider
-        if 'range_slider' in class_name:
-            return 'range_slider'
-        elif 'slider' in class_name:
-            return 'slider'
-        elif 'button' in class_name:
-            return 'button'
-        elif 'text' in class_name:
-            return 'text'
-        elif 'checkbox' in class_name:
-            return 'checkbox'
-        elif 'radio' in class_name:
-            return 'radio'
-        elif 'multiselect' in class_name:
-            return 'multiselect'
-        elif 'dropdown' in class_name or 'select' in class_name:
-            return 'dropdown'
-        elif 'number' in class_name:
-            return 'number'
+        widget_type = self._detect_widget_type(obj)
+        self._widget_type_cache[id(obj)] = (obj, widget_type)
+        return widget_type
+
+    def _detect_widget_type(self, obj: Any) -> str:
+        """Detect widget type with fallbacks"""
+        # Check class name for type hints, probed once per class
+        obj_class = type(obj)
+        if obj_class in _widget_type_by_class:
+            widget_type = _widget_type_by_class[obj_class]
+        else:
+            class_name = str(obj_class).lower()
+            widget_type = next((wt for fragment, wt in CLASS_NAME_WIDGET_TYPES if fragment in class_name), None)
+            _widget_type_by_class[obj_class] = widget_type
+        if widget_type is not None:
+            return widget_type
         
         # Check for component type attribute
-        if hasattr(obj, '_component'):
-            component = obj._component
-            if hasattr(component, 'component_type'):
-                return str(component.component_type).lower()
+        component_type = getattr(getattr(obj, '_component', None), 'component_type', _MISSING)
+        if component_type is not _MISSING:
+            return str(component_type).lower()
         
         # Check for widget-specific attributes
         if hasattr(obj, 'min') and hasattr(obj, 'max'):
             return 'slider'
         elif hasattr(obj, 'options'):
-            # Try to distinguish between different option-based widgets
-            # Check class name more carefully
-            class_name = str(type(obj)).lower()
-            if 'radio' in class_name:
-                return 'radio'
-            elif 'multiselect' in class_name or 'multi_select' in class_name:
-                return 'multiselect'
-            elif 'dropdown' in class_name:
-                return 'dropdown'
-            else:
-                # Default to dropdown for options-based widgets
-                return 'dropdown'
+            # Class names naming an option-based widget (radio, multiselect, dropdown, *select)
+            # were already matched above, so this is an unnamed options widget
+            return 'dropdown'
         elif hasattr(obj, 'placeholder'):
             return 'text'
         
@@ -693,139 +971,54 @@ class MarimoCellExecutor:
     def _extract_widget_properties(self, obj: Any) -> Dict[str, Any]:
         """Extract widget properties"""
         properties = {}
+        # Instance attributes are read straight from __dict__, the rest through one getattr with a default
+        obj_dict = getattr(obj, '__dict__', None)
+        args = _widget_attr(obj, obj_dict, '_args')
+        if not isinstance(args, tuple):
+            args = ()
         
         # Common properties
-        if hasattr(obj, 'label'):
-            properties['label'] = getattr(obj, 'label')
+        label = _widget_attr(obj, obj_dict, 'label')
+        if label is not _MISSING:
+            properties['label'] = label
         
         # For marimo widgets, extract label from _args tuple
-        if hasattr(obj, '_args') and isinstance(obj._args, tuple) and len(obj._args) > 2:
-            label = obj._args[2]
+        if len(args) > 2:
+            label = args[2]
             if label and isinstance(label, str) and label.strip():
                 properties['label'] = label
         
         # Type-specific properties
         widget_type = self._get_widget_type(obj)
         
-        if widget_type == 'range_slider':
-            if hasattr(obj, 'start'):
-                properties['min'] = getattr(obj, 'start')  # Map start to min for frontend compatibility
-            if hasattr(obj, 'stop'):
-                properties['max'] = getattr(obj, 'stop')   # Map stop to max for frontend compatibility
-            if hasattr(obj, 'step'):
-                properties['step'] = getattr(obj, 'step')
-            # For range slider, also extract min/max from _args
-            if hasattr(obj, '_args') and isinstance(obj._args, tuple) and len(obj._args) > 4:
-                if isinstance(obj._args[4], dict):
-                    config = obj._args[4]
-                    if 'start' in config:
-                        properties['min'] = config['start']
-                    if 'stop' in config:
-                        properties['max'] = config['stop']
-                    if 'step' in config:
-                        properties['step'] = config['step']
-        elif widget_type == 'slider':
-            # First try direct attributes
-            if hasattr(obj, 'min'):
-                properties['min'] = getattr(obj, 'min')
-            if hasattr(obj, 'max'):
-                properties['max'] = getattr(obj, 'max')
-            if hasattr(obj, 'step'):
-                properties['step'] = getattr(obj, 'step')
-            
-            # For marimo sliders, also extract from _args tuple
-            # mo.ui.slider(start, stop, step=1, value=None, label="", ...)
-            if hasattr(obj, '_args') and isinstance(obj._args, tuple):
-                if len(obj._args) > 0 and obj._args[0] is not None:
-                    properties['min'] = obj._args[0]  # start parameter
-                if len(obj._args) > 1 and obj._args[1] is not None:
-                    properties['max'] = obj._args[1]  # stop parameter
-                if len(obj._args) > 2 and obj._args[2] is not None:
-                    properties['step'] = obj._args[2]  # step parameter
-            
-            # Also try alternative attribute names that marimo might use
-            if hasattr(obj, 'start'):
-                properties['min'] = getattr(obj, 'start')
-            if hasattr(obj, 'stop'):
-                properties['max'] = getattr(obj, 'stop')
-        
-        elif widget_type == 'text':
-            # First try direct attributes
-            if hasattr(obj, 'placeholder'):
-                properties['placeholder'] = getattr(obj, 'placeholder')
-            if hasattr(obj, 'max_length'):
-                properties['maxLength'] = getattr(obj, 'max_length')
-            
-            # For marimo text widgets, also extract from _args tuple
-            # mo.ui.text(value="", placeholder="", label="", ...)
-            if hasattr(obj, '_args') and isinstance(obj._args, tuple):
-                if len(obj._args) > 1 and obj._args[1] is not None:
-                    properties['placeholder'] = obj._args[1]  # placeholder parameter
-                # Additional parameters might be in kwargs
-                if len(obj._args) > 3 and isinstance(obj._args[3], dict):
-                    kwargs = obj._args[3]
-                    if 'placeholder' in kwargs:
-                        properties['placeholder'] = kwargs['placeholder']
-                    if 'max_length' in kwargs:
-                        properties['maxLength'] = kwargs['max_length']
+        for source, spec in WIDGET_PROPERTY_SOURCES.get(widget_type, ()):
+            if source == 'attr':
+                for (prop, _), value in zip(spec, _widget_attrs(obj, obj_dict, spec)):
+                    if value is not _MISSING:
+                        properties[prop] = value
+            elif source == 'args':
+                for prop, index in spec:
+                    if len(args) > index and args[index] is not None:
+                        properties[prop] = args[index]
+            else:
+                index, keys = spec
+                config = args[index] if len(args) > index else None
+                if isinstance(config, dict):
+                    for prop, key in keys:
+                        if key in config:
+                            properties[prop] = config[key]
         
-        elif widget_type in ['dropdown', 'select', 'radio', 'multiselect']:
-            # First try direct attributes
-            if hasattr(obj, 'options'):
-                options = getattr(obj, 'options', [])
-                if isinstance(options, (list, tuple)):
-                    properties['options'] = [
-                        {'value': opt, 'label': str(opt)} if not isinstance(opt, dict) else opt
-                        for opt in options
-                    ]
-                elif isinstance(options, dict):
-                    # Handle dictionary format: {label: value, ...}
-                    properties['options'] = [
-                        {'value': value, 'label': label}
-                        for label, value in options.items()
-                    ]
-            
-            # For marimo widgets, also extract options from _args tuple
+        if widget_type in OPTIONS_WIDGET_TYPES:
+            # For marimo widgets, options passed to the constructor win over the attribute
             # mo.ui.dropdown(options, value=None, label="", ...)
             # mo.ui.radio(options, value=None, label="", ...)
             # mo.ui.multiselect(options, value=None, label="", ...)
-            if hasattr(obj, '_args') and isinstance(obj._args, tuple):
-                if len(obj._args) > 0 and obj._args[0] is not None:
-                    options_arg = obj._args[0]
-                    if isinstance(options_arg, (list, tuple)):
-                        properties['options'] = [
-                            {'value': opt, 'label': str(opt)} if not isinstance(opt, dict) else opt
-                            for opt in options_arg
-                        ]
-                    elif isinstance(options_arg, dict):
-                        # Handle dictionary format: {label: value, ...}
-                        properties['options'] = [
-                            {'value': value, 'label': label}
-                            for label, value in options_arg.items()
-                        ]
-        
-        elif widget_type == 'number':
-            # First try direct attributes
-            if hasattr(obj, 'min'):
-                properties['min'] = getattr(obj, 'min')
-            if hasattr(obj, 'max'):
-                properties['max'] = getattr(obj, 'max')
-            if hasattr(obj, 'step'):
-                properties['step'] = getattr(obj, 'step')
-            
-            # For marimo number widgets, also extract from _args tuple
-            # mo.ui.number(start=0, stop=100, step=1, value=None, label="", ...)
-            if hasattr(obj, '_args') and isinstance(obj._args, tuple):
-                if len(obj._args) > 0 and obj._args[0] is not None:
-                    properties['min'] = obj._args[0]  # start parameter
-                if len(obj._args) > 1 and obj._args[1] is not None:
-                    properties['max'] = obj._args[1]  # stop parameter
-                if len(obj._args) > 2 and obj._args[2] is not None:
-                    properties['step'] = obj._args[2]  # step parameter
-        
-        elif widget_type == 'button':
-            if hasattr(obj, 'kind'):
-                properties['kind'] = getattr(obj, 'kind')
+            options = _normalize_options(args[0]) if args else None
+            if options is None:
+                # Fall back to the direct attribute
+                options = _normalize_options(_widget_attr(obj, obj_dict, 'options'))
+            if options is not None:
+                properties['options'] = options
         
         # Fallback to session method for additional properties
         session_properties = self.session._extract_widget_properties(obj)
@@ -835,52 +1028,57 @@ class MarimoCellExecutor:
 
     def _get_widget_value(self, obj: Any) -> Any:
         """Get widget value with fallbacks"""
-        # Try direct value attribute
-        if hasattr(obj, 'value'):
-            return getattr(obj, 'value')
+        obj_dict = getattr(obj, '__dict__', None)
         
-        # Try _value attribute
-        if hasattr(obj, '_value'):
-            return getattr(obj, '_value')
+        # Try direct value attribute, then _value attribute
+        for attr in ('value', '_value'):
+            value = _widget_attr(obj, obj_dict, attr)
+            if value is not _MISSING:
+                return value
         
         # Try component value
-        if hasattr(obj, '_component') and hasattr(obj._component, 'value'):
-            return getattr(obj._component, 'value')
+        component = _widget_attr(obj, obj_dict, '_component')
+        if component is not _MISSING:
+            value = getattr(component, 'value', _MISSING)
+            if value is not _MISSING:
+                return value
         
         # For marimo widgets, try to extract initial value from _args
         widget_type = self._get_widget_type(obj)
-        if hasattr(obj, '_args') and isinstance(obj._args, tuple):
+        args = _widget_attr(obj, obj_dict, '_args')
+        if isinstance(args, tuple):
+            arg_count = len(args)
             if widget_type == 'slider':
                 # mo.ui.slider(start, stop, step=1, value=None, ...)
                 # Value is typically the 4th parameter or in kwargs
-                if len(obj._args) > 3 and obj._args[3] is not None:
-                    return obj._args[3]
+                if arg_count > 3 and args[3] is not None:
+                    return args[3]
                 # If no explicit value, default to start value
-                elif len(obj._args) > 0 and obj._args[0] is not None:
-                    return obj._args[0]
-            elif widget_type in ['dropdown', 'select', 'radio']:
+                elif arg_count > 0 and args[0] is not None:
+                    return args[0]
+            elif widget_type in ('dropdown', 'select', 'radio'):
                 # mo.ui.dropdown(options, value=None, ...)
                 # Value is typically the 2nd parameter
-                if len(obj._args) > 1 and obj._args[1] is not None:
-                    return obj._args[1]
+                if arg_count > 1 and args[1] is not None:
+                    return args[1]
             elif widget_type == 'multiselect':
                 # mo.ui.multiselect(options, value=None, ...)
                 # Value is typically the 2nd parameter and should be a list
-                if len(obj._args) > 1 and obj._args[1] is not None:
-                    value = obj._args[1]
+                if arg_count > 1 and args[1] is not None:
+                    value = args[1]
                     return value if isinstance(value, list) else [value]
             elif widget_type == 'text':
                 # mo.ui.text(value="", ...)
                 # Value is typically the 1st parameter
-                if len(obj._args) > 0 and obj._args[0] is not None:
-                    return obj._args[0]
+                if arg_count > 0 and args[0] is not None:
+                    return args[0]
             elif widget_type == 'number':
                 # mo.ui.number(start, stop, step=1, value=None, ...)
                 # Value is typically the 4th parameter or start value
-                if len(obj._args) > 3 and obj._args[3] is not None:
-                    return obj._args[3]
-                elif len(obj._args) > 0 and obj._args[0] is not None:
-                    return obj._args[0]
+                if arg_count > 3 and args[3] is not None:
+                    return args[3]
+                elif arg_count > 0 and args[0] is not None:
+                    return args[0]
         
         # Default values based on widget type
         if widget_type == 'range_slider':
@@ -908,52 +1106,38 @@ class MarimoCellExecutor:
             
         widgets = []
         
-        try:
-            # Parse the code into an AST
-            tree = ast.parse(code)
-            
-            # Create a widget detector visitor
-            detector = WidgetDetectorVisitor(self.session)
-            detector.visit(tree)
-            
-            # Only show widgets from standalone expressions or function calls,
-            # NOT from simple assignments (which would create duplicates)
-            # Simple assignments like "checkbox = mo.ui.checkbox(...)" should not show output
-            
-            # Check function calls that might return widgets (standalone expressions)
-            for call_info in detector.widget_calls:
-                # Only include if this is a standalone expression, not part of an assignment
-                if not call_info.get('is_assignment'):
-                    # Try to evaluate the call if it's safe
-                    try:
-                        # Use globals only, as locals might not be available
-                        result = eval(call_info['code'], self.session.globals, {})
-                        if self._is_marimo_widget(result):
-                            widget_object_id = id(result)
-                            
-                            # Skip if already processed
-                            if widget_object_id not in processed_widgets:
-                                processed_widgets.add(widget_object_id)
-                                widget_result = self._format_widget_result(result)
-                                widgets.append(widget_result)
-                    except:
-                        pass  # Skip unsafe evaluations
-            
-        except (SyntaxError, ValueError):
-            # If AST parsing fails, fall back to simple widget detection
-            pass
+        # Check function calls that might return widgets (standalone expressions)
+        for call in _compile_widget_calls(code):
+            # Try to evaluate the call if it's safe
+            try:
+                # Use globals only, as locals might not be available
+                result = eval(call, self.session.globals, {})
+                if self._is_marimo_widget(result):
+                    widget_object_id = id(result)
+                    
+                    # Skip if already processed
+                    if widget_object_id not in processed_widgets:
+                        processed_widgets.add(widget_object_id)
+                        widget_result = self._format_widget_result(result)
+                        widgets.append(widget_result)
+            except:
+                pass  # Skip unsafe evaluations
         
         return widgets
 
 class WidgetDetectorVisitor(ast.NodeVisitor):
     """AST visitor to detect marimo widget patterns"""
     
+    __slots__ = ('session', 'widget_assignments', 'widget_calls', 'current_assignment_target', 'in_assignment', '_unparse_cache')
+    
     def __init__(self, session):
         self.session = session
         self.widget_assignments = {}
         self.widget_calls = []
         self.current_assignment_target = None
         self.in_assignment = False
+        # id(node) -> source; a standalone call is reached by visit_Expr and again by visit_Call
+        self._unparse_cache = {}
     
     def visit_Assign(self, node):
         """Visit assignment nodes to detect widget assignments"""
@@ -975,7 +1159,7 @@ class WidgetDetectorVisitor(ast.NodeVisitor):
         """Visit expression statements to detect standalone widget expressions"""
         # This handles standalone expressions like just "mo.ui.slider()" on its own line
         if self._is_widget_call(node.value):
-            call_code = ast.unparse(node.value) if hasattr(ast, 'unparse') else self._unparse_call(node.value)
+            call_code = self._call_source(node.value)
             self.widget_calls.append({
                 'code': call_code,
                 'node': node.value,
@@ -986,45 +1170,51 @@ class WidgetDetectorVisitor(ast.NodeVisitor):
     
     def visit_Call(self, node):
         """Visit function calls to detect widget creation"""
-        if self._is_widget_call(node):
-            call_code = ast.unparse(node) if hasattr(ast, 'unparse') else self._unparse_call(node)
-            # Only add if this call is not already handled by visit_Expr or visit_Assign
-            if not self.in_assignment:
-                self.widget_calls.append({
-                    'code': call_code,
-                    'node': node,
-                    'is_assignment': False
-                })
+        # Only add if this call is not already handled by visit_Assign
+        if not self.in_assignment and self._is_widget_call(node):
+            self.widget_calls.append({
+                'code': self._call_source(node),
+                'node': node,
+                'is_assignment': False
+            })
         
         self.generic_visit(node)
     
     def _is_widget_call(self, node):
         """Check if a call node represents a widget creation"""
-        if not isinstance(node, ast.Call):
+        # AST node classes aren't subclassed, so exact type checks are enough and skip the MRO walk
+        if type(node) is not ast.Call:
             return False
         
+        func = node.func
+        func_type = type(func)
+        
+        # Check for direct widget function calls
+        if func_type is ast.Name:
+            return func.id in WIDGET_FUNCTION_NAMES
+        
         # Check for mo.ui.* calls
-        if isinstance(node.func, ast.Attribute):
+        if func_type is ast.Attribute:
+            owner = func.value
+            owner_type = type(owner)
             # Handle mo.ui.slider(), mo.ui.button(), etc.
-            if (isinstance(node.func.value, ast.Attribute) and 
-                isinstance(node.func.value.value, ast.Name) and
-                node.func.value.value.id == 'mo' and
-                node.func.value.attr == 'ui'):
-                return True
+            if owner_type is ast.Attribute:
+                return owner.attr == 'ui' and type(owner.value) is ast.Name and owner.value.id == 'mo'
             
             # Handle direct ui.slider() calls (if ui is imported)
-            if (isinstance(node.func.value, ast.Name) and
-                node.func.value.id == 'ui'):
-                return True
-        
-        # Check for direct widget function calls
-        if isinstance(node.func, ast.Name):
-            widget_functions = ['slider', 'button', 'text', 'checkbox', 'dropdown', 'select', 'radio', 'multiselect', 'number']
-            if node.func.id in widget_functions:
-                return True
+            if owner_type is ast.Name:
+                return owner.id == 'ui'
         
         return False
     
+    def _call_source(self, node):
+        """Source of a call node, unparsed once per node"""
+        call_code = self._unparse_cache.get(id(node))
+        if call_code is None:
+            call_code = ast.unparse(node) if hasattr(ast, 'unparse') else self._unparse_call(node)
+            self._unparse_cache[id(node)] = call_code
+        return call_code
+    
     def _unparse_call(self, node):
         """Fallback unparsing for older Python versions"""
         try:
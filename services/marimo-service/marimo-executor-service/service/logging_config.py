@@ -3,14 +3,26 @@ Logging configuration for the Marimo Executor Service.
 """
 
 import logging
-import sys
-from typing import Optional
+import logging.config
+from typing import Optional, Tuple
+
+
+LOG_FORMAT = {
+    'format': '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
+    'datefmt': '%Y-%m-%d %H:%M:%S',
+}
+
+# (level, log_file) the "marimo_executor" logger is currently configured with
+_configured_with: Optional[Tuple[int, Optional[str]]] = None
 
 
 def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> logging.Logger:
     """
     Set up logging configuration for the Marimo Executor Service.
     
+    Calling it again with the same settings (e.g. on re-import) keeps the
+    existing handlers instead of rebuilding them.
+    
     Args:
         log_level: The logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Optional path to log file. If None, logs to stdout only.
@@ -18,34 +30,41 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> lo
     Returns:
         Configured logger instance
     """
-    # Create logger
+    global _configured_with
+
     logger = logging.getLogger("marimo_executor")
-    logger.setLevel(getattr(logging, log_level.upper(), logging.INFO))
-    
-    # Clear any existing handlers
-    logger.handlers.clear()
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, log_level.upper(), logging.INFO))
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler (if specified)
+    level = logging.getLevelNamesMapping().get(log_level.upper(), logging.INFO)
+    if _configured_with == (level, log_file):
+        return logger
+
+    # Console handler, plus a file handler if specified
+    handlers = {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'level': level,
+            'formatter': 'default',
+        },
+    }
     if log_file:
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(getattr(logging, log_level.upper(), logging.INFO))
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
-    # Prevent duplicate logs
-    logger.propagate = False
+        handlers['file'] = {
+            'class': 'logging.FileHandler',
+            'filename': log_file,
+            'level': level,
+            'formatter': 'default',
+        }
+
+    logging.config.dictConfig({
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {'default': LOG_FORMAT},
+        'handlers': handlers,
+        'loggers': {
+            # Prevent duplicate logs
+            'marimo_executor': {'level': level, 'handlers': list(handlers), 'propagate': False},
+        },
+    })
+    _configured_with = (level, log_file)
     
     return logger
 
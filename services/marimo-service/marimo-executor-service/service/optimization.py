@@ -1,11 +1,24 @@
 import io
-import gzip
 from typing import Any, Dict
 import numpy as np
 import plotly.graph_objects as go
+import plotly.io as pio
+import matplotlib
+# Headless service: pin the raster backend before pyplot loads instead of letting it probe for one
+matplotlib.use('Agg')
 from matplotlib import pyplot as plt
 from config import Config
 
+try:
+    import orjson
+
+    def _dumps(data: Any) -> str:
+        # Non-str keys are stringified, as json.dumps does
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    import json
+    _dumps = json.dumps
+
 class PlotOptimizer:
     def __init__(self):
         self.webgl_threshold = Config.WEBGL_THRESHOLD
@@ -21,50 +34,65 @@ class PlotOptimizer:
     def _optimize_matplotlib(self, fig: plt.Figure) -> Dict[str, Any]:
         """Optimize matplotlib figure"""
         buffer = io.BytesIO()
-        fig.savefig(buffer, format='png', dpi='figure', bbox_inches='tight')
-        data = buffer.getvalue()
+        fig.savefig(buffer, format='png', dpi='figure', bbox_inches=self._tight_bbox(fig))
         
+        # PNG is already DEFLATE-compressed, gzipping it again costs CPU for no size gain
         return {
             'type': 'PLOT',
-            'data': self._compress_if_needed(data),
+            'data': buffer.getvalue(),
             'mime_type': 'image/png'
         }
 
+    def _tight_bbox(self, fig: plt.Figure) -> Any:
+        """
+        Tight bounding box for savefig, measured without rendering the figure.
+
+        bbox_inches='tight' makes savefig render the whole figure once just to
+        measure it; the Agg canvas's renderer can measure the artists directly.
+        Figures whose layout engine only settles while drawing keep the 'tight' path.
+        """
+        get_renderer = getattr(fig.canvas, 'get_renderer', None)
+        if get_renderer is None or fig.get_layout_engine() is not None:
+            return 'tight'
+        return fig.get_tightbbox(get_renderer()).padded(plt.rcParams['savefig.pad_inches'])
+
     def _optimize_plotly(self, fig: go.Figure) -> Dict[str, Any]:
         """Optimize plotly figure"""
-        # Convert to WebGL for large datasets
+        # 'auto' serializes with orjson, which writes numpy arrays natively, and falls back to json without it
         if self._should_use_webgl(fig):
-            fig = self._convert_to_webgl(fig)
+            # Convert to WebGL for large datasets; the dict came from a validated figure, don't validate it again
+            content = pio.to_json(self._convert_to_webgl(fig), validate=False, engine='auto')
+        else:
+            content = fig.to_json(engine='auto')
         
         return {
             'type': 'PLOT',
-            'content': fig.to_json(),
+            'content': content,
             'mime_type': 'application/json'
         }
 
     def _should_use_webgl(self, fig: go.Figure) -> bool:
         """Determine if WebGL should be used"""
+        threshold = self.webgl_threshold
         total_points = 0
         for trace in fig.data:
-            if hasattr(trace, 'x'):
-                total_points += len(trace.x)
-        return total_points > self.webgl_threshold
-
-    def _convert_to_webgl(self, fig: go.Figure) -> go.Figure:
-        """Convert compatible traces to WebGL"""
-        new_data = []
-        for trace in fig.data:
-            if trace.type == 'scatter':
-                trace.type = 'scattergl'
-            new_data.append(trace)
-        fig.data = new_data
-        return fig
+            x = getattr(trace, 'x', None)
+            if x is None:
+                continue
+            total_points += len(x)
+            # No need to count the remaining traces once over the threshold
+            if total_points > threshold:
+                return True
+        return False
 
-    def _compress_if_needed(self, data: bytes) -> bytes:
-        """Compress data if it exceeds threshold"""
-        if len(data) > 1_000_000:  # 1MB
-            return gzip.compress(data)
-        return data
+    def _convert_to_webgl(self, fig: go.Figure) -> Dict[str, Any]:
+        """Convert compatible traces to WebGL, as a plain figure dict"""
+        # A trace's type can't be reassigned and fig.data only accepts its own traces, so switch it in the dict
+        fig_dict = fig.to_dict()
+        for trace in fig_dict.get('data', ()):
+            if trace.get('type') == 'scatter':
+                trace['type'] = 'scattergl'
+        return fig_dict
 
 class OutputBuffer:
     def __init__(self):
@@ -86,10 +114,13 @@ class OutputBuffer:
     def _process_data(self, data: Any) -> Dict[str, Any]:
         """Process numerical data"""
         if isinstance(data, np.ndarray):
-            data = data.tolist()
+            # Formatted by numpy directly, large arrays are summarized instead of listed in full
+            content = np.array2string(data, threshold=Config.ARRAY_DISPLAY_THRESHOLD, max_line_width=120, separator=', ')
+        else:
+            content = repr(data)
         return {
             'type': 'TEXT',
-            'content': str(data),
+            'content': content,
             'mime_type': 'text/plain'
         }
 
@@ -103,9 +134,8 @@ class OutputBuffer:
 
     def _process_dict(self, data: dict) -> Dict[str, Any]:
         """Process dictionary output"""
-        import json
         return {
             'type': 'TEXT',
-            'content': json.dumps(data),
+            'content': _dumps(data),
             'mime_type': 'application/json'
         }
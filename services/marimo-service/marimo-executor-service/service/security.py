@@ -1,21 +1,50 @@
 import ast
-from typing import Tuple
+from functools import lru_cache
+from typing import FrozenSet, Tuple
 from config import Config
 
+# Builtins that would run arbitrary, unvalidated code
+BLOCKED_CALLS = frozenset({'exec', 'eval'})
+
+@lru_cache(maxsize=256)
+def parse_code(code: str) -> ast.Module:
+    """
+    Parsed tree of a cell's source, shared by every read-only pass over it.
+
+    Validation, widget detection and session tracking all look at the same
+    source in one execution, so it's parsed once. Callers must not mutate the tree.
+    """
+    return ast.parse(code)
+
 class SecurityValidator:
     def __init__(self):
-        self.allowed_imports = Config.ALLOWED_IMPORTS
-        self.blocked_modules = Config.BLOCKED_MODULES
+        # frozenset() of a frozenset is the same object, and normalises any list/tuple override to O(1) lookups
+        self.allowed_imports = frozenset(Config.ALLOWED_IMPORTS)
+        self.blocked_modules = frozenset(Config.BLOCKED_MODULES)
         self.max_code_length = Config.MAX_CODE_LENGTH
 
     def validate_code(self, code: str) -> Tuple[bool, str]:
         """Validate code for security concerns"""
-        if len(code) > self.max_code_length:
-            return False, f"Code exceeds maximum length of {self.max_code_length} characters"
+        return self._validate_cached(code, self.allowed_imports, self.blocked_modules, self.max_code_length)
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _validate_cached(code: str, allowed_imports: FrozenSet[str], blocked_modules: FrozenSet[str],
+                         max_code_length: int) -> Tuple[bool, str]:
+        """
+        Verdict for one source under one policy.
+
+        Executors build a fresh validator per request, so the cache is keyed on
+        the policy values rather than the instance; re-running a cell is a lookup.
+        """
+        if len(code) > max_code_length:
+            return False, f"Code exceeds maximum length of {max_code_length} characters"
 
         try:
-            tree = ast.parse(code)
-            result = self._validate_ast(tree)
+            # Always walk the tree: identifiers are NFKC-normalized, so a blocked name
+            # can appear in the source under other characters (fullwidth 'ｅｘｅｃ')
+            tree = parse_code(code)
+            result = SecurityValidator._validate_ast(tree, allowed_imports, blocked_modules)
             if not result[0]:
                 return result
             return True, ""
@@ -24,38 +53,39 @@ class SecurityValidator:
         except Exception as e:
             return False, f"Validation error: {str(e)}"
 
-    def _validate_ast(self, tree: ast.AST) -> Tuple[bool, str]:
+    @staticmethod
+    def _validate_ast(tree: ast.AST, allowed_imports: FrozenSet[str],
+                      blocked_modules: FrozenSet[str]) -> Tuple[bool, str]:
         """Validate the AST for security concerns"""
         for node in ast.walk(tree):
             # Check imports
             if isinstance(node, (ast.Import, ast.ImportFrom)):
-                result = self._validate_import(node)
+                result = SecurityValidator._validate_import(node, allowed_imports, blocked_modules)
                 if not result[0]:
                     return result
 
             # Check for exec/eval calls
             elif isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name) and node.func.id in ['exec', 'eval']:
+                if isinstance(node.func, ast.Name) and node.func.id in BLOCKED_CALLS:
                     return False, "Use of exec() or eval() is not allowed"
 
         return True, ""
 
-    def _validate_import(self, node: ast.AST) -> Tuple[bool, str]:
+    @staticmethod
+    def _validate_import(node: ast.AST, allowed_imports: FrozenSet[str],
+                         blocked_modules: FrozenSet[str]) -> Tuple[bool, str]:
         """Validate import statements"""
         if isinstance(node, ast.Import):
-            for name in node.names:
-                module = name.name.split('.')[0]
-                if module in self.blocked_modules:
-                    return False, f"Import of {module} is blocked"
-                if module not in self.allowed_imports:
-                    return False, f"Import of {module} is not allowed"
-        
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                module = node.module.split('.')[0]
-                if module in self.blocked_modules:
-                    return False, f"Import of {module} is blocked"
-                if module not in self.allowed_imports:
-                    return False, f"Import of {module} is not allowed"
+            modules = [name.name.partition('.')[0] for name in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules = [node.module.partition('.')[0]]
+        else:
+            return True, ""
+
+        for module in modules:
+            if module in blocked_modules:
+                return False, f"Import of {module} is blocked"
+            if module not in allowed_imports:
+                return False, f"Import of {module} is not allowed"
 
         return True, ""
@@ -1,23 +1,176 @@
 from datetime import datetime, timedelta
-import uuid
-import asyncio
 import os
 import tempfile
 import shutil
 import ast
 import sys
-from typing import Dict, Optional, Any, Tuple, List, Set
+import hashlib
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Any, Tuple, List, Set
 import marimo as mo
 from minio import Minio
 from config import Config
 from .logging_config import get_logger
+from .security import parse_code
 
 # Import the executor here to avoid circular imports
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .executor import MarimoCellExecutor
 
+def widget_characteristics_hash(widget_type: str, properties: Dict[str, Any], value: Any) -> str:
+    """Stable short hash identifying a widget by its type, properties and value"""
+    # repr of a canonical tuple is far cheaper than json.dumps(sort_keys=True)
+    characteristics = (widget_type, tuple(sorted(properties.items())), value)
+    return hashlib.blake2b(repr(characteristics).encode(), digest_size=4).hexdigest()
+
+# Statements with their own scope; names bound inside them don't reach module globals
+_SCOPE_STATEMENTS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+@lru_cache(maxsize=512)
+def _analyze_code(code: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """
+    (top-level imported module names, plainly assigned names) of a cell's module scope.
+
+    Import tracking and both initialization-conflict cleanups read these for the
+    same source on every run. Compound statements (if/for/while/try/with/match) are
+    entered, function and class bodies are not. Raises SyntaxError for unparsable code.
+    """
+    imported_modules = set()
+    assigned_names = set()
+    statements = list(parse_code(code).body)
+    while statements:
+        node = statements.pop()
+        if isinstance(node, ast.Import):
+            # Handle: import module, import module as alias
+            for alias in node.names:
+                imported_modules.add(alias.name.partition('.')[0])  # Get top-level module
+
+        elif isinstance(node, ast.ImportFrom):
+            # Handle: from module import name, from module import name as alias
+            if node.module:
+                imported_modules.add(node.module.partition('.')[0])  # Get top-level module
+
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    assigned_names.add(target.id)
+
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            if isinstance(node.target, ast.Name):
+                assigned_names.add(node.target.id)
+
+        elif not isinstance(node, _SCOPE_STATEMENTS):
+            # Module-scope blocks: bodies, else/finally branches, except handlers and match cases
+            statements.extend(getattr(node, 'body', ()))
+            statements.extend(getattr(node, 'orelse', ()))
+            statements.extend(getattr(node, 'finalbody', ()))
+            for block in (*getattr(node, 'handlers', ()), *getattr(node, 'cases', ())):
+                statements.extend(block.body)
+
+    return frozenset(imported_modules), frozenset(assigned_names)
+
+# Widget attributes copied into the properties sent to the frontend, in output order
+WIDGET_PROPERTY_ATTRS = ('start', 'stop', 'step', 'label', 'disabled', 'options', 'placeholder', 'show_value', 'orientation')
+# Sliders expose their bounds as start/stop, the frontend expects min/max
+SLIDER_PROPERTY_KEYS = {'start': 'min', 'stop': 'max'}
+
+_MISSING = object()
+
+# Read size while streaming one byte range of a large asset to disk
+_RANGE_STREAM_BYTES = 1024 * 1024
+
+class CellIndex(dict):
+    """
+    cell_id -> set of names (variables, modules or widget ids) the cell owns,
+    with a reverse index answering "which cells own this name" in O(1).
+
+    Entries are replaced or deleted as a whole; remove a single name through
+    discard_name() so the reverse index stays in step.
+    """
+    __slots__ = ('_cells_by_name',)
+
+    def __init__(self, entries: Optional[Dict[str, Set[str]]] = None):
+        super().__init__()
+        self._cells_by_name: Dict[str, Set[str]] = {}
+        for cell_id, names in (entries or {}).items():
+            self[cell_id] = names
+
+    def __setitem__(self, cell_id: str, names: Set[str]) -> None:
+        self._unindex(cell_id)
+        super().__setitem__(cell_id, names)
+        for name in names:
+            self._cells_by_name.setdefault(name, set()).add(cell_id)
+
+    def __delitem__(self, cell_id: str) -> None:
+        self._unindex(cell_id)
+        super().__delitem__(cell_id)
+
+    def copy(self) -> 'CellIndex':
+        return CellIndex(self)
+
+    def discard_name(self, cell_id: str, name: str) -> None:
+        """Remove one name from a cell's entry"""
+        self[cell_id].discard(name)
+        self._unindex_name(cell_id, name)
+
+    def owned_by_other_cell(self, name: str, cell_id: str) -> bool:
+        """Whether a cell other than cell_id owns name"""
+        cells = self._cells_by_name.get(name)
+        return bool(cells) and (len(cells) > 1 or cell_id not in cells)
+
+    def _unindex(self, cell_id: str) -> None:
+        for name in self.get(cell_id, ()):
+            self._unindex_name(cell_id, name)
+
+    def _unindex_name(self, cell_id: str, name: str) -> None:
+        cells = self._cells_by_name.get(name)
+        if cells is not None:
+            cells.discard(cell_id)
+            if not cells:
+                del self._cells_by_name[name]
+
+@lru_cache(maxsize=1)
+def _get_minio_client() -> Minio:
+    """
+    Process-wide MinIO client.
+
+    Its urllib3 pool is thread-safe, so sessions and the session manager share
+    connections instead of each opening (and TLS-handshaking) their own.
+    """
+    return Minio(
+        Config.MINIO_ENDPOINT,
+        access_key=Config.MINIO_ACCESS_KEY,
+        secret_key=Config.MINIO_SECRET_KEY,
+        secure=Config.MINIO_SECURE
+    )
+
+# Per-class result of the widget probe in _extract_widget_id_from_variable:
+# the attribute holding the widget ID, or None for classes that aren't widgets.
+# Weak keys: every tracked variable's class lands here, and a class defined in a cell
+# holds its session's globals through its methods
+_widget_id_attr_by_class: 'weakref.WeakKeyDictionary[type, Optional[str]]' = weakref.WeakKeyDictionary()
+
+# component_id -> asset prefix its assets were last found under; only the current format is
+# remembered, so old-format components keep checking whether they were re-uploaded
+_asset_prefix_cache: Dict[str, str] = {}
+
+# Removes the working directories of ended sessions off the RPC threads
+_cleanup_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="session-cleanup")
+
 class NotebookSession:
+    # Fixed attribute set, sessions don't carry a per-instance __dict__
+    __slots__ = (
+        'session_id', 'notebook_path', 'component_id', 'globals', 'last_accessed',
+        'cell_outputs', 'working_dir', 'logger',
+        'widgets', '_widget_to_var', '_widget_hash_index',
+        'cell_variables', 'cell_imports', 'cell_widgets', 'cell_references', 'cell_result_cache',
+        '_pre_execution_state',
+    )
+
     def __init__(self, session_id: str, notebook_path: str, initial_code: str, component_id: Optional[str] = None):
         self.session_id = session_id
         self.notebook_path = notebook_path
@@ -29,12 +182,15 @@ class NotebookSession:
         self.logger = get_logger("session")
         # Widget state management
         self.widgets = {}  # widget_id -> widget_object mapping
-        self.widget_dependencies = {}  # component_id -> [widget_ids] it depends on
+        self._widget_to_var = {}  # widget_id -> global variable name it was last tracked under
+        self._widget_hash_index = {}  # characteristics hash -> widget_id, entries are verified on lookup
         # Cell-variable tracking for session management
-        self.cell_variables = {}  # cell_id -> set of variable names defined by this cell
-        self.cell_imports = {}  # cell_id -> set of imported module names by this cell
-        self.cell_globals_snapshot = {}  # cell_id -> dict of globals before execution
-        self.cell_widgets = {}  # cell_id -> set of widget_ids created by this cell
+        self.cell_variables = CellIndex()  # cell_id -> set of variable names defined by this cell
+        self.cell_imports = CellIndex()  # cell_id -> set of imported module names by this cell
+        self.cell_widgets = CellIndex()  # cell_id -> set of widget_ids created by this cell
+        self.cell_references = CellIndex()  # cell_id -> set of names the cell reads but doesn't define
+        self.cell_result_cache = {}  # cell_id -> (cache key, outputs, cell_state, variables) of its last cached run
+        self._pre_execution_state = None  # (any name, name -> value before the running cell for the names it may bind)
         self._setup_working_directory()
         self._initialize_namespace(initial_code)
 
@@ -45,65 +201,146 @@ class NotebookSession:
         if self.component_id:
             # Download assets from MinIO to working directory
             try:
-                minio_client = Minio(
-                    Config.MINIO_ENDPOINT,
-                    access_key=Config.MINIO_ACCESS_KEY,
-                    secret_key=Config.MINIO_SECRET_KEY,
-                    secure=Config.MINIO_SECURE
-                )
+                minio_client = _get_minio_client()
                 
                 # List all assets for this component
                 asset_prefix = f"components/{self.component_id}/assets/"
-                self.logger.debug(f"Looking for assets with prefix: {asset_prefix}")
-                objects = minio_client.list_objects(Config.MINIO_BUCKET, prefix=asset_prefix, recursive=True)
-                
-                asset_count = 0
-                for obj in objects:
-                    asset_count += 1
-                    self.logger.debug(f"Found asset: {obj.object_name}")
-                    # Extract the filename from the full path
-                    # Path format: components/{componentId}/assets/{assetType}/{filename}
-                    relative_path = obj.object_name[len(asset_prefix):]
-                    if '/' in relative_path:
-                        # Skip the asset type directory and get just the filename
-                        filename = relative_path.split('/')[-1]
-                    else:
-                        filename = relative_path
-                    
-                    if filename:  # Only process actual files, not directories
-                        local_file_path = os.path.join(self.working_dir, filename)
-                        self.logger.debug(f"Downloading {obj.object_name} to {local_file_path}")
-                        minio_client.fget_object(Config.MINIO_BUCKET, obj.object_name, local_file_path)
-                        self.logger.info(f"Successfully downloaded: {filename}")
-                
+                # Old path format, in case assets were uploaded before the fix
+                old_asset_prefix = f"marimo/components/{self.component_id}/assets/"
+
+                if _asset_prefix_cache.get(self.component_id) == asset_prefix:
+                    self.logger.debug(f"Looking for assets with prefix: {asset_prefix}")
+                    objects = self._list_assets(minio_client, asset_prefix)
+                    old_objects = []
+                else:
+                    # List both formats at once instead of paying for the fallback listing after an empty one
+                    self.logger.debug(f"Looking for assets with prefixes: {asset_prefix}, {old_asset_prefix}")
+                    with ThreadPoolExecutor(max_workers=2) as pool:
+                        objects, old_objects = pool.map(
+                            lambda prefix: self._list_assets(minio_client, prefix),
+                            (asset_prefix, old_asset_prefix)
+                        )
+
+                asset_count = self._download_assets(minio_client, asset_prefix, objects)
                 self.logger.info(f"Downloaded {asset_count} assets to working directory: {self.working_dir}")
-                if asset_count == 0:
+                if asset_count:
+                    # Later sessions for this component can skip the old path format
+                    _asset_prefix_cache[self.component_id] = asset_prefix
+                else:
                     self.logger.debug(f"No assets found for component {self.component_id}")
-                    # Let's also try the old path format in case assets were uploaded before the fix
-                    old_asset_prefix = f"marimo/components/{self.component_id}/assets/"
-                    self.logger.debug(f"Checking old path format with prefix: {old_asset_prefix}")
-                    old_objects = minio_client.list_objects(Config.MINIO_BUCKET, prefix=old_asset_prefix, recursive=True)
-                    old_count = 0
-                    for obj in old_objects:
-                        old_count += 1
-                        self.logger.debug(f"Found old format asset: {obj.object_name}")
-                        # Extract the filename from the full path
-                        relative_path = obj.object_name[len(old_asset_prefix):]
-                        if '/' in relative_path:
-                            filename = relative_path.split('/')[-1]
-                        else:
-                            filename = relative_path
-                        
-                        if filename:  # Only download if we have a valid filename
-                            local_file_path = os.path.join(self.working_dir, filename)
-                            self.logger.debug(f"Downloading old format {obj.object_name} to {local_file_path}")
-                            minio_client.fget_object(Config.MINIO_BUCKET, obj.object_name, local_file_path)
-                            self.logger.info(f"Successfully downloaded from old path: {filename}")
+                    old_count = self._download_assets(minio_client, old_asset_prefix, old_objects)
                     self.logger.info(f"Downloaded {old_count} assets from old path format")
                         
             except Exception as e:
+                _asset_prefix_cache.pop(self.component_id, None)
                 self.logger.warning(f"Failed to download assets for component {self.component_id}: {e}")
 
+    def _list_assets(self, minio_client: Minio, asset_prefix: str) -> List[Any]:
+        """
+        All objects stored under asset_prefix.
+
+        Assets sit one level down ({assetType}/{filename}), so a single recursive
+        listing is fewer requests than listing the type directories and then each
+        of them. Only names and sizes are read; user metadata and versions stay off.
+        """
+        return list(minio_client.list_objects(
+            Config.MINIO_BUCKET,
+            prefix=asset_prefix,
+            recursive=True,
+            include_user_meta=False,
+            include_version=False
+        ))
+
+    def _download_assets(self, minio_client: Minio, asset_prefix: str, objects: List[Any]) -> int:
+        """
+        Download the objects listed under asset_prefix into the working directory.
+
+        Objects are fetched concurrently since each one is mostly an HTTP round trip.
+        Returns the number of objects listed under the prefix.
+        """
+        downloads = {}  # local path -> (object name, size), later objects win like the sequential loop did
+        for obj in objects:
+            self.logger.debug(f"Found asset: {obj.object_name}")
+            # Path format: {prefix}{assetType}/{filename}, only the filename is kept
+            filename = obj.object_name[len(asset_prefix):].rpartition('/')[2]
+            if filename:  # Only process actual files, not directories
+                downloads[os.path.join(self.working_dir, filename)] = (obj.object_name, obj.size)
+
+        if not downloads:
+            return len(objects)
+
+        # The client's urllib3 pool is thread-safe, so the workers share it. Small objects and the
+        # ranges of large ones go through this one pool, so concurrent GETs never exceed its size
+        large = {path: spec for path, spec in downloads.items() if spec[1] and spec[1] > Config.ASSET_RANGE_CHUNK_BYTES}
+        task_count = len(downloads) - len(large) + sum(-(-size // Config.ASSET_RANGE_CHUNK_BYTES) for _, size in large.values())
+        range_slots = threading.BoundedSemaphore(Config.ASSET_RANGE_CONCURRENCY)
+        fds = []
+        try:
+            with ThreadPoolExecutor(max_workers=min(Config.ASSET_DOWNLOAD_WORKERS, task_count)) as pool:
+                pending = {}
+                remaining = {}  # local path -> futures still running for it
+                for local_file_path, (object_name, size) in downloads.items():
+                    if local_file_path in large:
+                        fd = self._preallocate(local_file_path, size)
+                        fds.append(fd)
+                        futures = self._download_large(pool, range_slots, minio_client, object_name, fd, size)
+                    else:
+                        futures = [pool.submit(minio_client.fget_object, Config.MINIO_BUCKET, object_name, local_file_path)]
+                    remaining[local_file_path] = len(futures)
+                    pending.update(dict.fromkeys(futures, local_file_path))
+                for future in as_completed(pending):
+                    future.result()
+                    local_file_path = pending[future]
+                    remaining[local_file_path] -= 1
+                    if not remaining[local_file_path]:
+                        self.logger.info(f"Successfully downloaded: {os.path.basename(local_file_path)}")
+        finally:
+            # After the pool has shut down, so no range is still writing to them
+            for fd in fds:
+                os.close(fd)
+
+        return len(objects)
+
+    @staticmethod
+    def _preallocate(local_file_path: str, size: int) -> int:
+        """Open local_file_path for writing with size bytes reserved, returning the fd"""
+        fd = os.open(local_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            # Not available on this platform or filesystem, a sparse file of the right size will do
+            os.ftruncate(fd, size)
+        return fd
+
+    def _download_large(self, pool: ThreadPoolExecutor, range_slots: threading.BoundedSemaphore, minio_client: Minio,
+                        object_name: str, fd: int, size: int) -> List[Future]:
+        """
+        Queue one large object on pool as byte-range GETs written into fd at their offsets.
+
+        A single stream is capped by one connection's throughput. range_slots bounds the
+        range GETs in flight across all large objects; each range is streamed to disk
+        piece by piece rather than held in memory whole.
+        """
+        chunk = Config.ASSET_RANGE_CHUNK_BYTES
+
+        def fetch_range(start: int) -> None:
+            with range_slots:
+                response = minio_client.get_object(Config.MINIO_BUCKET, object_name, offset=start, length=min(chunk, size - start))
+                try:
+                    for piece in response.stream(_RANGE_STREAM_BYTES):
+                        data = memoryview(piece)
+                        # pwrite may write less than asked, keep going until the piece is on disk
+                        while data:
+                            written = os.pwrite(fd, data, start)
+                            data = data[written:]
+                            start += written
+                finally:
+                    response.close()
+                    response.release_conn()
+
+        self.logger.debug(f"Downloading {object_name} in {-(-size // chunk)} ranges")
+        return [pool.submit(fetch_range, start) for start in range(0, size, chunk)]
+
     def _initialize_namespace(self, initial_code: str):
         """Initialize the global namespace and execute initial code."""
         self.globals.update({
@@ -115,7 +352,7 @@ class NotebookSession:
             self.logger.debug("Executing initial code for session initialization")
             from .executor import MarimoCellExecutor
             executor = MarimoCellExecutor(self)
-            executor.execute_cell('initialization', initial_code)
+            executor.execute_cell(self.INIT_CELL_ID, initial_code)
 
     def update_last_accessed(self):
         self.last_accessed = datetime.now()
@@ -124,51 +361,69 @@ class NotebookSession:
         return (datetime.now() - self.last_accessed) > timedelta(minutes=timeout_minutes)
 
     def cleanup(self):
-        """Clean up the working directory."""
+        """Clean up the working directory in the background, ending a session doesn't wait on the filesystem."""
         if self.working_dir and os.path.exists(self.working_dir):
-            try:
-                shutil.rmtree(self.working_dir)
-                self.logger.info(f"Cleaned up working directory: {self.working_dir}")
-            except Exception as e:
-                self.logger.warning(f"Failed to clean up working directory {self.working_dir}: {e}")
+            _cleanup_pool.submit(self._remove_working_dir, self.working_dir)
+
+    def _remove_working_dir(self, working_dir: str) -> None:
+        """Delete a working directory; runs on the cleanup pool"""
+        try:
+            shutil.rmtree(working_dir)
+            self.logger.info(f"Cleaned up working directory: {working_dir}")
+        except Exception as e:
+            self.logger.warning(f"Failed to clean up working directory {working_dir}: {e}")
 
     # Cell-variable tracking methods for session management
     
+    # Cell id the notebook's initial code runs under
+    INIT_CELL_ID = 'initialization'
+
     # Protected variables that should never be cleaned up
-    PROTECTED_VARIABLES = {
+    PROTECTED_VARIABLES = frozenset({
         'mo', 'marimo', '__builtins__', '__name__', '__doc__', 
         '__package__', '__loader__', '__spec__', '__file__'
-    }
+    })
+
+    # Protected modules that should never be cleaned up
+    PROTECTED_MODULES = frozenset({
+        'marimo', 'mo',  # Marimo itself
+        'builtins', '__builtin__',  # Built-in modules
+        'sys', 'os', 'io',  # Core system modules
+        'typing', 'collections',  # Core Python modules
+        'datetime', 'time',  # Time modules
+        'json', 'pickle',  # Serialization modules
+        'tempfile', 'shutil',  # File system modules
+        'uuid', 'asyncio',  # Utility modules
+        'ast', 'inspect',  # Introspection modules
+        'minio', 'config',  # Project-specific modules
+    })
 
     def _is_protected_variable(self, var_name: str) -> bool:
         """Check if variable should be protected from cleanup"""
-        return (var_name in self.PROTECTED_VARIABLES or 
-                var_name.startswith('_') or
-                var_name.startswith('__'))
+        # startswith('_') also covers dunder names
+        return var_name in self.PROTECTED_VARIABLES or var_name.startswith('_')
 
-    def _capture_pre_execution_state(self, cell_id: str) -> Dict[str, Any]:
-        """Capture globals state before cell execution"""
-        # Create a deep copy of current globals to avoid reference issues
-        return {k: v for k, v in self.globals.items()}
+    def _begin_variable_tracking(self, candidate_names: Optional[Iterable[str]]) -> None:
+        """
+        Capture the current values of the names a cell may bind, read back by _track_cell_variables.
 
-    def _track_cell_variables(self, cell_id: str, pre_state: Dict[str, Any]) -> None:
+        candidate_names None means any name (a star import): every global is captured and
+        names that appear during the run are compared too.
+        """
+        names = self.globals.keys() if candidate_names is None else candidate_names
+        self._pre_execution_state = (candidate_names is None, {name: self.globals.get(name, _MISSING) for name in names})
+
+    def _track_cell_variables(self, cell_id: str) -> None:
         """Track which variables this cell defined/modified"""
-        current_vars = set(self.globals.keys())
-        pre_vars = set(pre_state.keys())
-        
-        # Variables added by this cell
-        new_vars = current_vars - pre_vars
-        
-        # Variables modified by this cell (compare object identity for performance)
-        modified_vars = set()
-        for var in pre_vars & current_vars:
-            # Use 'is not' for object identity comparison to detect reassignment
-            if self.globals[var] is not pre_state[var]:
-                modified_vars.add(var)
+        any_name, pre_state = self._pre_execution_state or (False, {})
+        self._pre_execution_state = None
+        candidates = pre_state.keys() | self.globals.keys() if any_name else pre_state.keys()
         
+        # Candidates that are new or rebound (object identity), deleted ones aren't its variables
         # Only track non-protected variables
-        tracked_vars = {var for var in (new_vars | modified_vars) 
-                       if not self._is_protected_variable(var)}
+        tracked_vars = {var for var in candidates
+                       if pre_state.get(var, _MISSING) is not self.globals.get(var, _MISSING)
+                       and var in self.globals and not self._is_protected_variable(var)}
         
         # Store tracking info
         if tracked_vars:  # Only store if there are variables to track
@@ -176,14 +431,33 @@ class NotebookSession:
         elif cell_id in self.cell_variables:
             # Clear tracking if no variables to track
             del self.cell_variables[cell_id]
-            
-        # Store the pre-execution snapshot for this cell
-        self.cell_globals_snapshot[cell_id] = pre_state
 
     def get_cell_variables(self, cell_id: str) -> set:
         """Get the set of variables defined by a specific cell"""
         return self.cell_variables.get(cell_id, set())
 
+    def cache_cell_result(self, cell_id: str, cache_key: Tuple[bytes, bytes], outputs: List[Dict[str, Any]], cell_state: Dict[str, str]) -> None:
+        """Remember a cell's outputs and the variables it defined under its cache key"""
+        variables = {var: self.globals[var] for var in self.get_cell_variables(cell_id) if var in self.globals}
+        self.cell_result_cache[cell_id] = (cache_key, outputs, cell_state, variables)
+
+    def restore_cached_cell_result(self, cell_id: str, cache_key: Tuple[bytes, bytes]) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+        """
+        Restore the variables of a cached run and return its (outputs, cell_state).
+
+        Returns None when the cell has no cached run under this key.
+        """
+        entry = self.cell_result_cache.get(cell_id)
+        if entry is None or entry[0] != cache_key:
+            return None
+
+        _, outputs, cell_state, variables = entry
+        # Other cells may have rebound these names since the cached run
+        self.globals.update(variables)
+        if variables:
+            self.cell_variables[cell_id] = set(variables)
+        return outputs, cell_state
+
     def get_all_tracked_cells(self) -> List[str]:
         """Get list of all cells that have tracked variables"""
         return list(self.cell_variables.keys())
@@ -191,22 +465,8 @@ class NotebookSession:
     def _track_cell_imports(self, cell_id: str, code: str) -> None:
         """Track modules imported by this cell using AST parsing"""
         try:
-            # Parse the code to find import statements
-            tree = ast.parse(code)
-            imported_modules = set()
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    # Handle: import module, import module as alias
-                    for alias in node.names:
-                        module_name = alias.name.split('.')[0]  # Get top-level module
-                        imported_modules.add(module_name)
-                        
-                elif isinstance(node, ast.ImportFrom):
-                    # Handle: from module import name, from module import name as alias
-                    if node.module:
-                        module_name = node.module.split('.')[0]  # Get top-level module
-                        imported_modules.add(module_name)
+            # Import statements found in the code, analyzed once per distinct source
+            imported_modules, _ = _analyze_code(code)
             
             # Only track non-protected modules
             filtered_imports = {mod for mod in imported_modules 
@@ -222,56 +482,43 @@ class NotebookSession:
             # If code can't be parsed, skip import tracking
             self.logger.warning(f"Could not parse imports for cell '{cell_id}': {e}")
     
+    def _track_cell_references(self, cell_id: str, referenced_names: FrozenSet[str]) -> None:
+        """Track names this cell reads from other cells, after its variables are tracked"""
+        # A cell that defines a name itself doesn't depend on another cell's version of it
+        references = referenced_names - self.get_cell_variables(cell_id)
+        if references:
+            self.cell_references[cell_id] = set(references)
+        elif cell_id in self.cell_references:
+            del self.cell_references[cell_id]
+
     def _cleanup_cell_imports(self, cell_id: str) -> None:
         """Remove modules imported by this cell if not used by other cells"""
         if cell_id not in self.cell_imports:
             return  # No imports to clean up for this cell
         
-        modules_to_remove = []
-        for module_name in self.cell_imports[cell_id]:
-            if module_name in sys.modules:
-                # Only remove if not imported by other cells and not protected
-                if (not self._is_module_used_by_other_cells(cell_id, module_name) and
-                    not self._is_protected_module(module_name)):
-                    modules_to_remove.append(module_name)
+        # Loaded modules of this cell, resolved against sys.modules in one intersection
+        loaded = sys.modules.keys() & self.cell_imports[cell_id]
+        # Only remove if not imported by other cells and not protected
+        modules_to_remove = [module_name for module_name in loaded - self.PROTECTED_MODULES
+                             if not self._is_protected_module(module_name) and
+                             not self._is_module_used_by_other_cells(cell_id, module_name)]
         
-        # Remove the modules from sys.modules
+        # Remove the modules from sys.modules; already removed ones are ignored
         for module_name in modules_to_remove:
-            try:
-                del sys.modules[module_name]
-                self.logger.debug(f"Cleaned up imported module '{module_name}' from cell '{cell_id}'")
-            except KeyError:
-                # Module was already removed, ignore
-                pass
+            sys.modules.pop(module_name, None)
+            self.logger.debug(f"Cleaned up imported module '{module_name}' from cell '{cell_id}'")
         
         # Clear tracking for this cell
         del self.cell_imports[cell_id]
     
     def _is_module_used_by_other_cells(self, current_cell_id: str, module_name: str) -> bool:
         """Check if module is imported by other cells"""
-        for cell_id, modules in self.cell_imports.items():
-            if cell_id != current_cell_id and module_name in modules:
-                return True
-        return False
+        return self.cell_imports.owned_by_other_cell(module_name, current_cell_id)
     
     def _is_protected_module(self, module_name: str) -> bool:
         """Check if module should be protected from cleanup"""
-        # Protected modules that should never be cleaned up
-        protected_modules = {
-            'marimo', 'mo',  # Marimo itself
-            'builtins', '__builtin__',  # Built-in modules
-            'sys', 'os', 'io',  # Core system modules
-            'typing', 'collections',  # Core Python modules
-            'datetime', 'time',  # Time modules
-            'json', 'pickle',  # Serialization modules
-            'tempfile', 'shutil',  # File system modules
-            'uuid', 'asyncio',  # Utility modules
-            'ast', 'inspect',  # Introspection modules
-        }
-        
-        return (module_name in protected_modules or 
-                module_name.startswith('_') or  # Private modules
-                module_name in ['minio', 'config'])  # Project-specific modules
+        return (module_name in self.PROTECTED_MODULES or 
+                module_name.startswith('_'))  # Private modules
     
     def get_cell_imports(self, cell_id: str) -> Set[str]:
         """Get the set of modules imported by a specific cell"""
@@ -326,6 +573,7 @@ class NotebookSession:
                 widget_id = self._extract_widget_id_from_variable(var_value)
                 if widget_id and widget_id in self.widgets:
                     cell_widget_ids.add(widget_id)
+                    self._widget_to_var[widget_id] = var_name
         
         if cell_widget_ids:
             self.cell_widgets[cell_id] = cell_widget_ids
@@ -335,14 +583,24 @@ class NotebookSession:
     
     def _extract_widget_id_from_variable(self, var_value: Any) -> Optional[str]:
         """Extract widget ID from a variable value if it's a marimo widget"""
+        value_class = type(var_value)
+        id_attr = _widget_id_attr_by_class.get(value_class, _MISSING)
+        if id_attr is _MISSING:
+            id_attr = self._probe_widget_id_attr(var_value)
+            _widget_id_attr_by_class[value_class] = id_attr
+        
+        return getattr(var_value, id_attr, None) if id_attr else None
+    
+    def _probe_widget_id_attr(self, var_value: Any) -> Optional[str]:
+        """Attribute holding the widget ID for values of this class, None if they aren't widgets"""
         # Check if the variable is a marimo widget
         if hasattr(var_value, '_id') and hasattr(var_value, '_kind'):
             # This looks like a marimo widget
-            return getattr(var_value, '_id', None)
+            return '_id'
         
         # Check for common marimo widget attributes
-        if hasattr(var_value, 'id') and str(type(var_value)).find('marimo') != -1:
-            return getattr(var_value, 'id', None)
+        if hasattr(var_value, 'id') and 'marimo' in str(type(var_value)):
+            return 'id'
         
         return None
     
@@ -366,14 +624,12 @@ class NotebookSession:
                 self.logger.debug(f"Cleaned up widget '{widget_id}' from cell '{cell_id}'")
                 
                 # Also remove from global variables if it exists as a variable
-                for var_name in list(self.globals.keys()):
-                    if var_name in self.globals:
-                        var_value = self.globals[var_name]
-                        if (hasattr(var_value, '_id') and 
-                            getattr(var_value, '_id', None) == widget_id):
-                            del self.globals[var_name]
-                            self.logger.debug(f"Cleaned up widget variable '{var_name}' from globals")
-                            break
+                var_name = self._widget_to_var.pop(widget_id, None)
+                # The name may have been rebound to something else since it was tracked
+                if (var_name in self.globals and
+                        self._extract_widget_id_from_variable(self.globals[var_name]) == widget_id):
+                    del self.globals[var_name]
+                    self.logger.debug(f"Cleaned up widget variable '{var_name}' from globals")
                             
             except KeyError:
                 # Widget was already removed, ignore
@@ -384,10 +640,7 @@ class NotebookSession:
     
     def _is_widget_used_by_other_cells(self, current_cell_id: str, widget_id: str) -> bool:
         """Check if widget is created/used by other cells"""
-        for cell_id, widget_ids in self.cell_widgets.items():
-            if cell_id != current_cell_id and widget_id in widget_ids:
-                return True
-        return False
+        return self.cell_widgets.owned_by_other_cell(widget_id, current_cell_id)
     
     def _is_protected_widget(self, widget_id: str) -> bool:
         """Check if widget should be protected from cleanup"""
@@ -467,39 +720,24 @@ class NotebookSession:
         
         # Clear tracking for this cell
         del self.cell_variables[cell_id]
-        if cell_id in self.cell_globals_snapshot:
-            del self.cell_globals_snapshot[cell_id]
 
     def _cleanup_conflicting_initial_variables(self, cell_id: str, new_code: str) -> None:
         """Clean up variables from initialization that conflict with current cell's new variables"""
-        if cell_id == 'initialization':
+        if cell_id == self.INIT_CELL_ID:
             return  # Don't clean up initialization from itself
         
-        if 'initialization' not in self.cell_variables:
+        init_variables = self.cell_variables.get(self.INIT_CELL_ID)
+        if init_variables is None:
             return  # No initialization variables to conflict with
         
         # Parse the new code to find what variables will be defined
         try:
-            tree = ast.parse(new_code)
-            new_variables = set()
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Assign):
-                    for target in node.targets:
-                        if isinstance(target, ast.Name):
-                            new_variables.add(target.id)
-                elif isinstance(node, ast.AugAssign):
-                    if isinstance(node.target, ast.Name):
-                        new_variables.add(node.target.id)
-                elif isinstance(node, ast.AnnAssign):
-                    if isinstance(node.target, ast.Name):
-                        new_variables.add(node.target.id)
+            _, new_variables = _analyze_code(new_code)
         except (SyntaxError, ValueError):
             # If we can't parse the code, skip cleanup - execution will handle the error
             return
         
         # Check which initialization variables conflict with new variables
-        init_variables = self.cell_variables['initialization'].copy()  # Copy to avoid modification during iteration
         variables_to_remove = []
         
         for var_name in new_variables:
@@ -512,73 +750,49 @@ class NotebookSession:
         for var_name in variables_to_remove:
             try:
                 del self.globals[var_name]
-                self.cell_variables['initialization'].discard(var_name)
+                self.cell_variables.discard_name(self.INIT_CELL_ID, var_name)
                 self.logger.debug(f"Cleaned up conflicting initial variable '{var_name}' for cell '{cell_id}'")
             except KeyError:
                 pass
         
         # If initialization cell has no more variables, clean up its tracking
-        if not self.cell_variables['initialization']:
-            del self.cell_variables['initialization']
-            if 'initialization' in self.cell_globals_snapshot:
-                del self.cell_globals_snapshot['initialization']
+        if not init_variables:
+            del self.cell_variables[self.INIT_CELL_ID]
 
     def _cleanup_conflicting_initial_imports(self, cell_id: str, new_code: str) -> None:
         """Clean up imports from initialization that conflict with current cell's new imports"""
-        if cell_id == 'initialization':
+        if cell_id == self.INIT_CELL_ID:
             return  # Don't clean up initialization from itself
         
-        if 'initialization' not in self.cell_imports:
+        init_imports = self.cell_imports.get(self.INIT_CELL_ID)
+        if init_imports is None:
             return  # No initialization imports to conflict with
         
         # Parse the new code to find what modules will be imported
         try:
-            tree = ast.parse(new_code)
-            new_imports = set()
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        module_name = alias.name.split('.')[0]
-                        new_imports.add(module_name)
-                elif isinstance(node, ast.ImportFrom):
-                    if node.module:
-                        module_name = node.module.split('.')[0]
-                        new_imports.add(module_name)
+            new_imports, _ = _analyze_code(new_code)
         except (SyntaxError, ValueError):
             # If we can't parse the code, skip cleanup
             return
         
-        # Check which initialization imports conflict with new imports
-        init_imports = self.cell_imports['initialization'].copy()
-        imports_to_remove = []
-        
-        for module_name in new_imports:
-            if module_name in init_imports:
-                # This module from initialization will be reimported, so clean it up
-                if not self._is_protected_module(module_name):
-                    imports_to_remove.append(module_name)
+        # Modules from initialization that will be reimported get cleaned up
+        imports_to_remove = [module_name for module_name in new_imports & init_imports
+                             if not self._is_protected_module(module_name)]
         
         # Remove conflicting modules and update tracking
         for module_name in imports_to_remove:
-            try:
-                if module_name in sys.modules:
-                    del sys.modules[module_name]
-                self.cell_imports['initialization'].discard(module_name)
-                self.logger.debug(f"Cleaned up conflicting initial import '{module_name}' for cell '{cell_id}'")
-            except KeyError:
-                pass
+            sys.modules.pop(module_name, None)
+            self.cell_imports.discard_name(self.INIT_CELL_ID, module_name)
+            self.logger.debug(f"Cleaned up conflicting initial import '{module_name}' for cell '{cell_id}'")
         
         # If initialization cell has no more imports, clean up its tracking
-        if not self.cell_imports['initialization']:
-            del self.cell_imports['initialization']
-            del self.cell_globals_snapshot[cell_id]
+        if not init_imports:
+            del self.cell_imports[self.INIT_CELL_ID]
 
     def _is_variable_used_by_other_cells(self, current_cell_id: str, var_name: str) -> bool:
         """Check if variable is defined by other cells OR used by other cells"""
-        for cell_id, variables in self.cell_variables.items():
-            if cell_id != current_cell_id and var_name in variables:
-                return True
+        if self.cell_variables.owned_by_other_cell(var_name, current_cell_id):
+            return True
         
         # ENHANCED: Check if variable is used (referenced) by other cells
         # by analyzing dependencies between cells
@@ -586,86 +800,8 @@ class NotebookSession:
     
     def _is_variable_referenced_by_other_cells(self, current_cell_id: str, var_name: str) -> bool:
         """Check if a variable is referenced (used) by other cells"""
-        # For now, we'll use a simple heuristic: if removing this variable would 
-        # cause other cells' variables to become invalid, then it's referenced
-        
-        # Get cells that were executed after this one and might depend on it
-        other_cells = [cell_id for cell_id in self.cell_variables.keys() 
-                      if cell_id != current_cell_id]
-        
-        for other_cell_id in other_cells:
-            # Check if this other cell's variables would be orphaned
-            # This is a simplified dependency check - in a full implementation,
-            # we'd parse the AST to find actual variable references
-            other_vars = self.cell_variables[other_cell_id]
-            
-            # If the other cell has variables and this variable exists in globals,
-            # assume there might be a dependency. This is conservative but safe.
-            if other_vars and var_name in self.globals:
-                # Do a more sophisticated check: try to identify if removing this
-                # variable would break the other cell's execution context
-                if self._might_have_dependency(other_cell_id, var_name):
-                    return True
-        
-        return False
-    
-    def _might_have_dependency(self, cell_id: str, var_name: str) -> bool:
-        """Enhanced check if a cell might depend on a variable"""
-        
-        if cell_id not in self.cell_variables:
-            return False
-        
-        # For import variables and module references, we need to be smarter
-        # Check if this is an import alias (like 'pd' for pandas)
-        if self._is_import_alias(var_name):
-            # If the other cell explicitly defined this variable, then there's no dependency
-            # (the other cell created its own version of the import)
-            if var_name in self.cell_variables[cell_id]:
-                return False
-            
-            # For import aliases, only preserve if the other cell also imported the same module
-            return self._other_cell_imports_same_module(cell_id, var_name)
-        
-        # For regular variables, use the original conservative approach:
-        # If the other cell explicitly defined this variable, then there's no dependency
-        # (the other cell created its own version)
-        if var_name in self.cell_variables[cell_id]:
-            return False
-        
-        # FIXED: For regular variables that the other cell didn't define itself,
-        # only assume dependency if we have evidence of actual usage.
-        # The previous logic was too conservative - just having variables in a cell
-        # doesn't mean it depends on ALL other variables.
-        # 
-        # For now, be less conservative - only preserve variables if there's
-        # explicit evidence of cross-cell dependency (which we don't track yet).
-        # This matches the behavior users expect.
-        return False
-
-    def _is_import_alias(self, var_name: str) -> bool:
-        """Check if a variable name is likely an import alias"""
-        # Simple heuristic: common import aliases
-        common_aliases = {'pd', 'np', 'plt', 'sns', 'os', 'sys', 'json', 'dt'}
-        if var_name in common_aliases:
-            return True
-        
-        # Check if any cell has imports and this variable appeared in that cell
-        for cell_id, imports in self.cell_imports.items():
-            if imports and cell_id in self.cell_variables:
-                cell_vars = self.cell_variables[cell_id]
-                if var_name in cell_vars:
-                    return True
-        
-        return False
-
-    def _other_cell_imports_same_module(self, cell_id: str, var_name: str) -> bool:
-        """Check if another cell imports the same module as this variable represents"""
-        # This is a simplified check - in a full implementation we'd need
-        # to track which import aliases map to which modules
-        if cell_id in self.cell_imports:
-            # If the other cell has any imports, be conservative
-            return len(self.cell_imports[cell_id]) > 0
-        return False
+        # References are recorded per cell when it runs, see _track_cell_references
+        return var_name in self.globals and self.cell_references.owned_by_other_cell(var_name, current_cell_id)
 
     def get_cleanup_preview(self, cell_id: str) -> Dict[str, Any]:
         """Preview what variables would be cleaned up for a cell (for debugging/testing)"""
@@ -719,8 +855,6 @@ class NotebookSession:
         
         # Clear tracking
         del self.cell_variables[cell_id]
-        if cell_id in self.cell_globals_snapshot:
-            del self.cell_globals_snapshot[cell_id]
     
     def optimize_session_performance(self) -> Dict[str, Any]:
         """Optimize session performance by cleaning up stale references and compacting data"""
@@ -729,17 +863,7 @@ class NotebookSession:
             'optimizations_applied': []
         }
         
-        # 1. Remove stale snapshots for cells that no longer exist
-        stale_snapshots = []
-        for cell_id in list(self.cell_globals_snapshot.keys()):
-            if cell_id not in self.cell_variables:
-                stale_snapshots.append(cell_id)
-                del self.cell_globals_snapshot[cell_id]
-        
-        if stale_snapshots:
-            stats['optimizations_applied'].append(f"Removed {len(stale_snapshots)} stale snapshots")
-        
-        # 2. Remove empty tracking entries
+        # 1. Remove empty tracking entries
         empty_cells = []
         for cell_id in list(self.cell_variables.keys()):
             if not self.cell_variables[cell_id]:
@@ -749,7 +873,7 @@ class NotebookSession:
         if empty_cells:
             stats['optimizations_applied'].append(f"Removed {len(empty_cells)} empty cell entries")
         
-        # 3. Cleanup orphaned imports (imports with no corresponding cells)
+        # 2. Cleanup orphaned imports (imports with no corresponding cells)
         orphaned_imports = []
         for cell_id in list(self.cell_imports.keys()):
             if cell_id not in self.cell_variables:
@@ -759,7 +883,7 @@ class NotebookSession:
         if orphaned_imports:
             stats['optimizations_applied'].append(f"Removed {len(orphaned_imports)} orphaned import entries")
         
-        # 4. Cleanup orphaned widgets
+        # 3. Cleanup orphaned widgets
         orphaned_widgets = []
         for cell_id in list(self.cell_widgets.keys()):
             if cell_id not in self.cell_variables:
@@ -780,7 +904,6 @@ class NotebookSession:
             'total_imports': sum(len(imports) for imports in self.cell_imports.values()),
             'total_widgets': len(self.widgets),
             'total_cell_widgets': sum(len(widgets) for widgets in self.cell_widgets.values()),
-            'snapshots': len(self.cell_globals_snapshot),
             'globals_size': len(self.globals)
         }
     
@@ -791,8 +914,7 @@ class NotebookSession:
         # Define thresholds for what constitutes "heavy" memory usage
         return (stats['tracked_cells'] > 100 or
                 stats['total_tracked_variables'] > 1000 or
-                stats['globals_size'] > 2000 or
-                len(self.cell_globals_snapshot) > 50)
+                stats['globals_size'] > 2000)
     
     def get_performance_recommendations(self) -> List[str]:
         """Get recommendations for improving session performance"""
@@ -808,18 +930,6 @@ class NotebookSession:
         if stats['globals_size'] > 1000:
             recommendations.append("Global namespace is large - consider periodic cleanup")
         
-        if len(self.cell_globals_snapshot) > 30:
-            recommendations.append("Many snapshots stored - run optimize_session_performance()")
-        
-        # Check for potential memory leaks
-        orphaned_count = 0
-        for cell_id in self.cell_globals_snapshot:
-            if cell_id not in self.cell_variables:
-                orphaned_count += 1
-        
-        if orphaned_count > 5:
-            recommendations.append(f"Detected {orphaned_count} orphaned snapshots - run optimize_session_performance()")
-        
         return recommendations
     
     def detect_circular_dependencies(self) -> Dict[str, List[str]]:
@@ -914,11 +1024,12 @@ class NotebookSession:
         """Perform cleanup with ability to rollback if issues are detected"""
         # Create backup of current state
         backup = {
-            'cell_variables': dict(self.cell_variables),
-            'cell_imports': dict(self.cell_imports),
-            'cell_widgets': dict(self.cell_widgets),
+            'cell_variables': self.cell_variables.copy(),
+            'cell_imports': self.cell_imports.copy(),
+            'cell_widgets': self.cell_widgets.copy(),
             'globals_backup': {k: v for k, v in self.globals.items()},
-            'widgets_backup': dict(self.widgets)
+            'widgets_backup': dict(self.widgets),
+            'widget_vars_backup': dict(self._widget_to_var)
         }
         
         cleanup_result = {
@@ -961,6 +1072,7 @@ class NotebookSession:
             self.cell_imports = backup['cell_imports']
             self.cell_widgets = backup['cell_widgets']
             self.widgets = backup['widgets_backup']
+            self._widget_to_var = backup['widget_vars_backup']
             
             # Restore globals (more careful restoration)
             for var_name, var_value in backup['globals_backup'].items():
@@ -972,33 +1084,17 @@ class NotebookSession:
     def validate_session_integrity(self) -> Dict[str, Any]:
         """Validate that the session state is consistent and identify any issues"""
         issues = {
-            'orphaned_snapshots': [],
-            'missing_snapshots': [],
             'invalid_references': [],
             'memory_leaks': [],
             'consistency_errors': []
         }
         
-        # Check for orphaned snapshots
-        for cell_id in self.cell_globals_snapshot:
-            if cell_id not in self.cell_variables:
-                issues['orphaned_snapshots'].append(cell_id)
-        
-        # Check for missing snapshots
-        for cell_id in self.cell_variables:
-            if cell_id not in self.cell_globals_snapshot:
-                issues['missing_snapshots'].append(cell_id)
-        
         # Check for invalid variable references
         for cell_id, variables in self.cell_variables.items():
             for var_name in variables:
                 if var_name not in self.globals and not self._is_protected_variable(var_name):
                     issues['invalid_references'].append(f"Cell {cell_id} tracks variable '{var_name}' not in globals")
         
-        # Check for potential memory leaks
-        if len(self.cell_globals_snapshot) > len(self.cell_variables) * 2:
-            issues['memory_leaks'].append("Excessive snapshots compared to active cells")
-        
         # Check for consistency between different tracking systems
         for cell_id in self.cell_imports:
             if cell_id not in self.cell_variables:
@@ -1014,7 +1110,7 @@ class NotebookSession:
         """Add a widget to the session registry"""
         is_new_widget = widget_id not in self.widgets
         
-        self.widgets[widget_id] = {
+        widget_info = {
             'object': widget_object,
             'type': self._get_widget_type(widget_object),
             'properties': self._extract_widget_properties(widget_object),
@@ -1022,6 +1118,8 @@ class NotebookSession:
             'dependencies': [],  # List of widget IDs this widget depends on
             'dependents': []     # List of widget IDs that depend on this widget
         }
+        self.widgets[widget_id] = widget_info
+        self._index_widget_hash(widget_id, widget_info)
         
         # Only update message for truly new widgets, not updates
         if is_new_widget:
@@ -1040,11 +1138,38 @@ class NotebookSession:
             elif hasattr(widget_obj, 'value'):
                 widget_obj.value = new_value
             self.widgets[widget_id]['value'] = new_value
+            self._index_widget_hash(widget_id, self.widgets[widget_id])
             # Widget value updated successfully
             
             # Trigger dependent widgets for re-evaluation
             self._trigger_dependent_widgets(widget_id)
 
+    def _index_widget_hash(self, widget_id: str, widget_info: Dict[str, Any]) -> None:
+        """Store the widget's characteristics hash and register it in the hash index"""
+        widget_hash = widget_characteristics_hash(widget_info['type'], widget_info['properties'], widget_info['value'])
+        widget_info['hash'] = widget_hash
+        # The first registered widget keeps the entry, as a scan in insertion order would
+        if self.find_widget_by_hash(widget_hash) is None:
+            self._widget_hash_index[widget_hash] = widget_id
+
+    def find_widget_by_hash(self, widget_hash: str) -> Optional[str]:
+        """Return the id of a registered widget with these characteristics, if any"""
+        widget_id = self._widget_hash_index.get(widget_hash)
+        if widget_id is None:
+            return None
+
+        widget_info = self.widgets.get(widget_id)
+        if widget_info is not None and widget_info.get('hash') == widget_hash:
+            return widget_id
+
+        # Indexed widget was removed or changed value, repair the entry from the stored hashes
+        widget_id = next((wid for wid, info in self.widgets.items() if info.get('hash') == widget_hash), None)
+        if widget_id is None:
+            del self._widget_hash_index[widget_hash]
+        else:
+            self._widget_hash_index[widget_hash] = widget_id
+        return widget_id
+
     def _trigger_dependent_widgets(self, widget_id: str) -> None:
         """Trigger re-evaluation of widgets that depend on this widget"""
         if widget_id in self.widgets:
@@ -1277,44 +1402,24 @@ class NotebookSession:
         widget_type = self._get_widget_type(widget_obj)
         
         # Common widget properties with type-specific mappings
-        if hasattr(widget_obj, 'start'):
-            if widget_type in ['range_slider', 'slider']:
-                properties['min'] = widget_obj.start  # Map start to min for sliders
-            else:
-                properties['start'] = widget_obj.start
-        if hasattr(widget_obj, 'stop'):
-            if widget_type in ['range_slider', 'slider']:
-                properties['max'] = widget_obj.stop   # Map stop to max for sliders
-            else:
-                properties['stop'] = widget_obj.stop
-        if hasattr(widget_obj, 'step'):
-            properties['step'] = widget_obj.step
-        if hasattr(widget_obj, 'label'):
-            properties['label'] = widget_obj.label
-        if hasattr(widget_obj, 'disabled'):
-            properties['disabled'] = widget_obj.disabled
-        if hasattr(widget_obj, 'options'):
-            # Convert marimo's dictionary format to array format for frontend
-            options_dict = widget_obj.options
-            if isinstance(options_dict, dict):
-                # Convert dictionary to array of objects
-                converted_options = [
+        property_keys = SLIDER_PROPERTY_KEYS if widget_type in ('range_slider', 'slider') else {}
+        for attr in WIDGET_PROPERTY_ATTRS:
+            # One lookup per attribute instead of hasattr() followed by the read
+            attr_value = getattr(widget_obj, attr, _MISSING)
+            if attr_value is _MISSING:
+                continue
+            if attr == 'options' and isinstance(attr_value, dict):
+                # Convert marimo's dictionary format to array format for frontend
+                attr_value = [
                     {'label': label, 'value': value} 
-                    for label, value in options_dict.items()
+                    for label, value in attr_value.items()
                 ]
-                properties['options'] = converted_options
-            else:
-                properties['options'] = options_dict
-        if hasattr(widget_obj, 'placeholder'):
-            properties['placeholder'] = widget_obj.placeholder
-        if hasattr(widget_obj, 'show_value'):
-            properties['show_value'] = widget_obj.show_value
-        if hasattr(widget_obj, 'orientation'):
-            properties['orientation'] = widget_obj.orientation
+            properties[property_keys.get(attr, attr)] = attr_value
         
         # For marimo widgets, extract label from _args tuple
-        if hasattr(widget_obj, '_args') and isinstance(widget_obj._args, tuple) and len(widget_obj._args) > 2:
-            label = widget_obj._args[2]
+        args = getattr(widget_obj, '_args', None)
+        if isinstance(args, tuple) and len(args) > 2:
+            label = args[2]
             if label and isinstance(label, str) and label.strip():
                 properties['label'] = label
         
@@ -1525,12 +1630,7 @@ class SessionManager:
         self.max_sessions = Config.MAX_SESSIONS
         self.timeout_minutes = Config.SESSION_TIMEOUT_MINUTES
         self.logger = get_logger("session_manager")
-        self.minio_client = Minio(
-            Config.MINIO_ENDPOINT,
-            access_key=Config.MINIO_ACCESS_KEY,
-            secret_key=Config.MINIO_SECRET_KEY,
-            secure=Config.MINIO_SECURE
-        )
+        self.minio_client = _get_minio_client()
 
     def create_session(self, session_id: str, notebook_path: str, component_id: Optional[str] = None) -> Tuple[str, NotebookSession]:
         """Create a new notebook session with a specific ID."""
@@ -0,0 +1,51 @@
+import threading
+from typing import Any, Dict, Tuple
+from .logging_config import get_logger
+
+class WidgetUpdateCoalescer:
+    """
+    Applies widget updates synchronously, collapsing concurrent ones for the same widget.
+
+    An update still waiting for its widget's apply lock when a newer value for the
+    same (session_id, widget_id) arrives is skipped; the newer value is applied by its
+    own caller, which also gets its error. Nothing is left queued once submit() returns.
+    """
+
+    def __init__(self):
+        self.logger = get_logger("widget_updates")
+        self._pending: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+        # (session_id, widget_id) -> [apply lock, callers using it]; the lock is dropped with its last caller
+        self._apply_locks: Dict[Tuple[str, str], list] = {}
+        # Guards _pending and _apply_locks
+        self._pending_lock = threading.Lock()
+
+    def submit(self, session, widget_id: str, value: Any) -> bool:
+        """
+        Apply a widget value, raising if the session rejects it.
+
+        Returns False without applying if a newer value for the same widget
+        arrived while this one was waiting.
+        """
+        key = (session.session_id, widget_id)
+        entry = (session, value)
+        with self._pending_lock:
+            self._pending[key] = entry
+            slot = self._apply_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+
+        try:
+            # Only updates of the same widget are ordered against each other
+            with slot[0]:
+                with self._pending_lock:
+                    if self._pending.get(key) is not entry:
+                        self.logger.debug(f"Widget {widget_id} update superseded by a newer value")
+                        return False
+                    del self._pending[key]
+
+                session.update_widget_value(widget_id, value)
+                return True
+        finally:
+            with self._pending_lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._apply_locks[key]